@@ -1,76 +1,593 @@
 import torch
 import pandas as pd
 import cv2
-from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from transformers import VideoMAEImageProcessor, VideoMAEForVideoClassification
 import numpy as np
 import os
+import re
+import subprocess
+from bisect import bisect_right
+from moviepy.config import FFMPEG_BINARY
+from modelRegistry import register_model, get_model, warm_start
+from framePipeline import FramePreprocessor
+from inferenceBackend import optimize_model
 
+# sampling="seek" jumps whenever a keyframe lies between the current position
+# and the next sampled frame (keyframes from _keyframe_scan). Without keyframe
+# positions it only seeks across gaps longer than a typical GOP (x264 default
+# keyint=250); shorter gaps are cheaper to skip with grab().
+SEEK_MIN_GAP_SEC = 10.0
 
-class DataFromVideo:
-    def __init__(self) -> None:
-        self.yolo = torch.hub.load(
-            "ultralytics/yolov5", "yolov5s", pretrained=True, trust_repo=True
-        )
-        self.processor = BlipProcessor.from_pretrained(
-            "Salesforce/blip-image-captioning-base"
-        )
-        self.blip = BlipForConditionalGeneration.from_pretrained(
-            "Salesforce/blip-image-captioning-base"
-        )
+# Sampled frames sent to YOLO per forward pass
+YOLO_BATCH_SIZE = 8
 
-        # Load VideoMAE for scene/action recognition
-        self.video_processor = VideoMAEImageProcessor.from_pretrained(
-            "MCG-NJU/videomae-base-finetuned-kinetics"
-        )
-        self.videomae = VideoMAEForVideoClassification.from_pretrained(
-            "MCG-NJU/videomae-base-finetuned-kinetics"
-        )
+# BLIP captioning: frames per generate() call and decoding budget
+# (num_beams=1 is greedy decoding)
+BLIP_BATCH_SIZE = 8
+BLIP_MAX_NEW_TOKENS = 20
+BLIP_NUM_BEAMS = 1
+
+# VideoMAE: timeline chunks stacked per forward pass
+VIDEOMAE_BATCH_SIZE = 4
+
+# Adaptive (shot-driven) sampling: the shot-detection pre-pass decodes only
+# the keyframes (ffmpeg scales them to SHOT_THUMB_SIZE), compares their HSV
+# histograms and starts a new shot when the Bhattacharyya distance exceeds
+# SHOT_THRESHOLD. Encoders place keyframes on scene cuts, so this finds cuts
+# for the cost of decoding a few frames per GOP.
+SHOT_THUMB_SIZE = (64, 36)
+SHOT_THRESHOLD = 0.35
+SHOT_MIN_SEC = 1.0  # ignore cuts closer than this to the previous one
+SHOT_SAMPLE_GAP_SEC = 20.0  # long static shots still get a frame/clip this often
+
+# Checkpoints (also part of the analysis cache key, see analysisCache.py)
+YOLO_REPO = "ultralytics/yolov5"
+YOLO_MODEL = "yolov5s"
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+VIDEOMAE_MODEL = "MCG-NJU/videomae-base-finetuned-kinetics"
+
+
+def _load_yolo():
+    yolo = torch.hub.load(YOLO_REPO, YOLO_MODEL, pretrained=True, trust_repo=True)
+    return optimize_model("yolo", yolo)
 
-    def analyze_video(self, video_path, step=60, output_csv="frame_metadata.csv"):
+
+def _load_blip():
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    blip = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
+    return processor, optimize_model("blip", blip, BLIP_MODEL)
+
+
+def _load_videomae():
+    # VideoMAE for scene/action recognition
+    video_processor = VideoMAEImageProcessor.from_pretrained(VIDEOMAE_MODEL)
+    videomae = VideoMAEForVideoClassification.from_pretrained(VIDEOMAE_MODEL)
+    return video_processor, optimize_model("videomae", videomae, VIDEOMAE_MODEL)
+
+
+register_model("yolo", _load_yolo)
+register_model("blip", _load_blip)
+register_model("videomae", _load_videomae)
+
+VIDEO_MODELS = ["yolo", "blip", "videomae"]
+
+
+class DataFromVideo:
+    """
+    Video analyzers. Models come from the process-wide registry, so creating
+    a DataFromVideo is cheap and each model is loaded at most once per
+    process, the first time an analyzer needs it.
+    """
+
+    def __init__(self, eager=False) -> None:
+        # Per-instance resize/normalize buffers (one instance per worker thread)
+        self.frames = FramePreprocessor()
+        if eager:
+            warm_start(VIDEO_MODELS)
+
+    @property
+    def yolo(self):
+        return get_model("yolo")
+
+    @property
+    def processor(self):
+        return get_model("blip")[0]
+
+    @property
+    def blip(self):
+        return get_model("blip")[1]
+
+    @property
+    def video_processor(self):
+        return get_model("videomae")[0]
+
+    @property
+    def videomae(self):
+        return get_model("videomae")[1]
+
+    def _save_csv(self, results_list, output_csv):
         # Create imageData directory path
         image_data_dir = os.path.join("test", "imageData")
         os.makedirs(image_data_dir, exist_ok=True)
-        
+
         # Create full path for CSV file
         csv_filepath = os.path.join(image_data_dir, output_csv)
-        
+        pd.DataFrame(results_list).to_csv(csv_filepath, index=False)
+        return csv_filepath
+
+    def _sample_indices(self, fps, total_frames, step=60, sample_fps=None):
+        """
+        Frame indices to analyze: every Nth frame, or sample_fps frames per
+        second of video when given (overrides step).
+        """
+        if sample_fps:
+            times = np.arange(0, total_frames / fps, 1.0 / sample_fps)
+            return sorted({int(round(t * fps)) for t in times if t * fps < total_frames})
+        return list(range(0, total_frames, step))
+
+    def _keyframe_scan(self, video_path, fps, thumb_size=SHOT_THUMB_SIZE):
+        """
+        Decode only the video's keyframes (ffmpeg -skip_frame nokey), scaled
+        to thumb_size by ffmpeg. Costs a small fraction of a full decode.
+
+        Returns (keyframe frame indices, BGR thumbnails), or (None, None)
+        when ffmpeg can't read the video.
+        """
+        w, h = thumb_size
+        proc = subprocess.run(
+            [
+                FFMPEG_BINARY, "-nostdin", "-hide_banner",
+                "-skip_frame", "nokey", "-i", video_path,
+                "-an", "-vf", f"scale={w}:{h},showinfo", "-vsync", "passthrough",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-",
+            ],
+            capture_output=True,
+        )
+        # showinfo logs one line per output frame with its presentation time
+        times = [
+            float(t) for t in re.findall(rb"pts_time:\s*(-?[\d.]+)", proc.stderr)
+        ]
+        thumbs = np.frombuffer(proc.stdout, dtype=np.uint8)
+        if proc.returncode != 0 or not times or thumbs.size != len(times) * w * h * 3:
+            print(f"[WARNING] Keyframe scan failed for {video_path}")
+            return None, None
+        keyframes = [int(round((t - times[0]) * fps)) for t in times]
+        return keyframes, list(thumbs.reshape(len(times), h, w, 3))
+
+    def detect_shots(
+        self,
+        video_path,
+        threshold=SHOT_THRESHOLD,
+        min_shot_sec=SHOT_MIN_SEC,
+        scan=None,
+    ):
+        """
+        Shot-boundary pre-pass over the keyframes only (see _keyframe_scan):
+        histogram distance between consecutive keyframe thumbnails. No model
+        runs here. A cut the encoder did not mark with a keyframe is found
+        at the next keyframe.
+
+        scan: (keyframes, thumbs) from an earlier _keyframe_scan to reuse.
+        Returns a list of (start_frame, end_frame) shots, end exclusive, or
+        None when the keyframes can't be read.
+        """
         cap = cv2.VideoCapture(video_path)
         fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_num = 0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        keyframes, thumbs = scan or self._keyframe_scan(video_path, fps)
+        if keyframes is None:
+            return None
+        min_gap = min_shot_sec * fps
+
+        boundaries = [0]
+        prev_hist = None
+        for frame_num, thumb in zip(keyframes, thumbs):
+            if frame_num >= total_frames:
+                break
+            hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+            hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+            cv2.normalize(hist, hist)
+            if prev_hist is not None:
+                distance = cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+                if distance > threshold and frame_num - boundaries[-1] >= min_gap:
+                    boundaries.append(frame_num)
+            prev_hist = hist
+
+        shots = list(zip(boundaries, boundaries[1:] + [total_frames]))
+        print(f"Detected {len(shots)} shots")
+        return shots
+
+    def _shot_sample_indices(self, shots, fps, max_gap_sec=SHOT_SAMPLE_GAP_SEC):
+        """
+        Representative frames for YOLO/BLIP: the middle of each shot, or
+        evenly spaced midpoints for shots longer than max_gap_sec.
+        """
+        indices = set()
+        for start, end in shots:
+            n = max(1, int(np.ceil((end - start) / (max_gap_sec * fps))))
+            for i in range(n):
+                indices.add(start + (end - start) * (2 * i + 1) // (2 * n))
+        return sorted(indices)
+
+    def _shot_chunks(self, shots, fps, chunk_seconds, num_frames,
+                     max_gap_sec=SHOT_SAMPLE_GAP_SEC):
+        """
+        VideoMAE chunks aligned to shots. A shot has no cut inside, so it is
+        labelled once per max_gap_sec: each piece reports its full span but
+        samples its num_frames from a chunk_seconds window in its middle;
+        with sampling="seek" the frames between windows are never decoded.
+        Same format as _timeline_chunks.
+        """
+        chunks = []
+        window = max(1, int(chunk_seconds * fps))
+        for start, end in shots:
+            n = max(1, int(np.ceil((end - start) / (max_gap_sec * fps))))
+            bounds = np.linspace(start, end, n + 1)
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                lo, hi = int(lo), int(hi)
+                w_lo = max(lo, (lo + hi - window) // 2)
+                w_hi = min(hi, w_lo + window)
+                frame_indices = np.linspace(w_lo, max(w_lo, w_hi - 1), num_frames, dtype=int)
+                chunks.append((lo / fps, hi / fps, frame_indices))
+        return chunks
+
+    def _sample_frames(self, cap, frame_indices, fps, sampling="seek", keyframes=None):
+        """
+        Yield (frame_num, frame) for the sorted frame_indices only.
+        Frames are decoded into one reused buffer, so each yielded frame is
+        only valid until the next one is read; keep a processed copy instead.
+
+        sampling:
+            "read": decode and convert every frame (original behaviour)
+            "grab": grab() skipped frames without retrieve(), so only sampled
+                    frames pay for the BGR conversion/copy. grab() still
+                    decodes, so every frame up to the last sample is decoded.
+            "seek": like "grab", but jump with CAP_PROP_POS_FRAMES when that
+                    skips decoding: the backend seeks to the keyframe before
+                    the target and decodes forward, which pays off whenever
+                    a keyframe lies after the current position. keyframes
+                    (sorted frame indices) make that exact; without them it
+                    seeks across gaps longer than SEEK_MIN_GAP_SEC.
+        """
+        pos = 0
+        buf = None
+        for idx in frame_indices:
+            if sampling == "seek" and idx > pos:
+                if keyframes:
+                    k = bisect_right(keyframes, idx) - 1
+                    jump = k >= 0 and keyframes[k] > pos
+                else:
+                    jump = idx - pos > SEEK_MIN_GAP_SEC * fps
+                if jump:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                    pos = idx
+            while pos < idx:
+                ok = cap.read()[0] if sampling == "read" else cap.grab()
+                if not ok:
+                    return
+                pos += 1
+            ret, frame = cap.read(buf)
+            if not ret:
+                return
+            buf = frame
+            pos += 1
+            yield idx, frame
+
+    def _detect_objects(self, batch, fps):
+        """
+        Run YOLO on a list of (frame_num, rgb_image) in one forward pass and
+        read the class ids straight from the xyxy tensors (x1, y1, x2, y2,
+        conf, cls). Images are FramePreprocessor.base() outputs.
+        """
+        results = self.yolo([frame for _, frame in batch])
+
         results_list = []
+        for (frame_num, _), det in zip(batch, results.xyxy):
+            class_ids = det[:, 5].int().tolist()
+            print(f"Frame {frame_num} → {len(class_ids)} detections")
+            for class_id in class_ids:
+                results_list.append(
+                    {
+                        "frame": frame_num,
+                        "timestamp_sec": frame_num / fps,
+                        "class": results.names[class_id],
+                        # "confidence": float(det[i, 4]),
+                    }
+                )
+        return results_list
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+    def _caption_frames(
+        self,
+        batch,
+        fps,
+        human_in_loop=False,
+        max_new_tokens=BLIP_MAX_NEW_TOKENS,
+        num_beams=BLIP_NUM_BEAMS,
+        dedupe_threshold=None,
+        last=None,
+    ):
+        """
+        Caption a list of (frame_num, image) with a single BLIP generate() call.
+        Images are FramePreprocessor.for_blip() outputs (RGB, model size), so
+        pixel values are built directly without the processor resizing again.
+
+        When dedupe_threshold is set, a frame whose thumbnail differs from the
+        last captioned frame by less than that mean absolute pixel difference
+        (0-255) reuses its caption instead of being sent to BLIP. `last` is a
+        dict carried across batches by the caller to continue that comparison.
+        """
+        if last is None:
+            last = {}
+
+        unique = []
+        refs = []  # index into unique, or None to reuse last["caption"]
+        for _, image in batch:
+            if dedupe_threshold is not None:
+                sig = self.frames.signature(image)
+                prev = last.get("sig")
+                if prev is not None and np.mean(np.abs(sig - prev)) < dedupe_threshold:
+                    refs.append(refs[-1] if refs else None)
+                    continue
+                last["sig"] = sig
+            refs.append(len(unique))
+            unique.append(image)
+
+        captions = []
+        if unique:
+            image_processor = self.processor.image_processor
+            pixel_values = self.frames.pixel_values(
+                unique, image_processor.image_mean, image_processor.image_std
+            )
+            with torch.no_grad():
+                out = self.blip.generate(
+                    pixel_values=pixel_values,
+                    max_new_tokens=max_new_tokens,
+                    num_beams=num_beams,
+                )
+            captions = self.processor.batch_decode(out, skip_special_tokens=True)
 
-            if frame_num % step == 0:  # process every Nth frame
-                # Run detection
-                results = self.yolo(frame)
-
-                # Convert to pandas DataFrame
-                df = results.pandas().xyxy[0]
-                print(f"Frame {frame_num} → {len(df)} detections")
-                for _, row in df.iterrows():
-                    results_list.append(
-                        {
-                            "frame": frame_num,
-                            "timestamp_sec": frame_num / fps,
-                            "class": row["name"],
-                            # "confidence": float(row["confidence"]),
-                        }
-                    )
-
-            frame_num += 1
+        results_list = []
+        for (frame_num, _), ref in zip(batch, refs):
+            caption = captions[ref] if ref is not None else last.get("caption", "")
+
+            if human_in_loop:
+                print(f"\nFrame {frame_num} → BLIP Caption: {caption}")
+                user_caption = input("Edit caption or press Enter to accept: ").strip()
+                if user_caption:
+                    caption = user_caption
+
+            print(f"Frame {frame_num} → Final Caption: {caption}")
+            results_list.append(
+                {
+                    "frame": frame_num,
+                    "timestamp_sec": frame_num / fps,
+                    "caption": caption,
+                }
+            )
+            last["caption"] = caption
+        return results_list
+
+    def _timeline_chunks(self, fps, total_frames, chunk_seconds, num_frames):
+        """
+        Split the video into chunk_seconds windows.
+        Returns a list of (chunk_start, chunk_end, frame_indices) tuples.
+        """
+        video_duration = total_frames / fps
+        chunks = []
+        chunk_start = 0
+        while chunk_start < video_duration:
+            start_frame = int(chunk_start * fps)
+            end_frame = int(min((chunk_start + chunk_seconds) * fps, total_frames - 1))
+            frame_indices = np.linspace(start_frame, end_frame, num_frames, dtype=int)
+            chunk_end = min(chunk_start + chunk_seconds, video_duration)
+            chunks.append((chunk_start, chunk_end, frame_indices))
+            chunk_start += chunk_seconds
+        return chunks
+
+    def _classify_clips(self, chunks, clips, num_frames):
+        """
+        Classify {chunk_idx: frames} in a single batched VideoMAE forward pass.
+        Clips missing frames (unreadable tail) are padded with their last frame
+        so every clip stacks to num_frames.
+        Returns {chunk_idx: result}
+        """
+        chunk_ids = sorted(clips)
+        videos = []
+        for chunk_idx in chunk_ids:
+            frames = clips[chunk_idx]
+            videos.append(frames + [frames[-1]] * (num_frames - len(frames)))
+
+        pixel_values = self.frames.pixel_values(
+            videos, self.video_processor.image_mean, self.video_processor.image_std
+        )
+        with torch.no_grad():
+            outputs = self.videomae(pixel_values=pixel_values)
+            logits = outputs.logits
+
+            # Calculate confidence score using softmax
+            probabilities = torch.softmax(logits, dim=-1)
+            confidences, predicted = probabilities.max(dim=-1)
+
+        results = {}
+        for i, chunk_idx in enumerate(chunk_ids):
+            chunk_start, chunk_end, _ = chunks[chunk_idx]
+            label = self.videomae.config.id2label[predicted[i].item()]
+            confidence = confidences[i].item()
+            print(
+                f"Chunk {chunk_start:.1f}s–{chunk_end:.1f}s → {label} (confidence: {confidence:.3f})"
+            )
+            results[chunk_idx] = {
+                "start_sec": chunk_start,
+                "end_sec": chunk_end,
+                "scene_label": label,
+                "confidence": round(confidence, 3),
+            }
+        return results
+
+    def iter_analysis(
+        self,
+        video_path,
+        objects=True,
+        captions=True,
+        scenes=True,
+        step=60,
+        sample_fps=None,
+        sampling="seek",
+        chunk_seconds=5,
+        num_frames=16,
+        batch_size=YOLO_BATCH_SIZE,
+        caption_batch_size=BLIP_BATCH_SIZE,
+        clip_batch_size=VIDEOMAE_BATCH_SIZE,
+        caption_kwargs=None,
+        adaptive=False,
+    ):
+        """
+        Shared forward scan behind every analyzer, as a generator. Frames are
+        read in order (no per-chunk random seeks) and routed to whichever
+        models need them; each model runs in batches as soon as enough
+        inputs are buffered, and every finished batch is yielded right away
+        so callers can stream partial results.
+
+        With adaptive=True a keyframe-only shot-detection pre-pass replaces
+        the fixed step/chunk grid: YOLO/BLIP see representative frames per
+        shot and VideoMAE classifies one clip per shot (per max gap), so
+        static footage decodes and analyzes far fewer frames. Falls back to
+        the fixed grid when the keyframes can't be read.
+
+        Yields: {"type": "objects" | "captions" | "timeline",
+                 "rows": [...], "progress": 0.0 - 1.0}
+        Timeline rows are yielded per batch, not necessarily in time order.
+        """
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        # One cheap keyframe-only scan serves shot detection and seek planning
+        keyframes, thumbs = (
+            self._keyframe_scan(video_path, fps)
+            if adaptive or sampling == "seek" else (None, None)
+        )
+        shots = self.detect_shots(video_path, scan=(keyframes, thumbs)) if adaptive else None
+
+        sampled = set()
+        if objects or captions:
+            if shots:
+                sampled = set(self._shot_sample_indices(shots, fps))
+            else:
+                sampled = set(self._sample_indices(fps, total_frames, step, sample_fps))
+
+        # frame index -> chunks that sample it (linspace may repeat an index)
+        chunks = []
+        wanted = {}
+        if scenes:
+            if shots:
+                chunks = self._shot_chunks(shots, fps, chunk_seconds, num_frames)
+            else:
+                chunks = self._timeline_chunks(fps, total_frames, chunk_seconds, num_frames)
+            for chunk_idx, (_, _, frame_indices) in enumerate(chunks):
+                for idx in frame_indices:
+                    wanted.setdefault(int(idx), []).append(chunk_idx)
+        remaining = [len(frame_indices) for _, _, frame_indices in chunks]
+        chunk_frames = {}
+        ready = {}  # complete clips waiting for a VideoMAE batch
+
+        caption_kwargs = dict(caption_kwargs or {}, last={})
+        batch = []
+        caption_batch = []
+
+        def event(kind, rows, progress):
+            return {"type": kind, "rows": rows, "progress": round(progress, 3)}
+
+        def timeline_rows(results):
+            return [results[i] for i in sorted(results)]
+
+        frame_indices = sorted(sampled | set(wanted))
+        for frame_num, frame in self._sample_frames(
+            cap, frame_indices, fps, sampling, keyframes
+        ):
+            progress = min(frame_num / total_frames, 1.0) if total_frames else 0.0
+            # One downscale per frame; the decode buffer is reused after this
+            base = self.frames.base(frame)
+            if frame_num in sampled:
+                if objects:
+                    batch.append((frame_num, base))
+                    if len(batch) == batch_size:
+                        yield event("objects", self._detect_objects(batch, fps), progress)
+                        batch = []
+                if captions:
+                    caption_batch.append((frame_num, self.frames.for_blip(base)))
+                    if len(caption_batch) == caption_batch_size:
+                        rows = self._caption_frames(caption_batch, fps, **caption_kwargs)
+                        yield event("captions", rows, progress)
+                        caption_batch = []
+
+            if frame_num in wanted:
+                clip_frame = self.frames.for_clip(base)
+                for chunk_idx in wanted.pop(frame_num):
+                    chunk_frames.setdefault(chunk_idx, []).append(clip_frame)
+                    remaining[chunk_idx] -= 1
+                    if remaining[chunk_idx] == 0:
+                        ready[chunk_idx] = chunk_frames.pop(chunk_idx)
+                if len(ready) >= clip_batch_size:
+                    results = self._classify_clips(chunks, ready, num_frames)
+                    yield event("timeline", timeline_rows(results), progress)
+                    ready = {}
 
         cap.release()
+        if batch:
+            yield event("objects", self._detect_objects(batch, fps), 1.0)
+        if caption_batch:
+            rows = self._caption_frames(caption_batch, fps, **caption_kwargs)
+            yield event("captions", rows, 1.0)
+
+        # CAP_PROP_FRAME_COUNT can overestimate; classify whatever was collected
+        ready.update(chunk_frames)
+        pending = sorted(ready)
+        for i in range(0, len(pending), clip_batch_size):
+            clips = {
+                chunk_idx: ready[chunk_idx]
+                for chunk_idx in pending[i : i + clip_batch_size]
+            }
+            results = self._classify_clips(chunks, clips, num_frames)
+            yield event("timeline", timeline_rows(results), 1.0)
+
+    def _analyze_pass(self, video_path, on_event=None, **kwargs):
+        """
+        Run iter_analysis to completion, forwarding each event to on_event.
+        Returns (result_list, detail_list, timeline)
+        """
+        collected = {"objects": [], "captions": [], "timeline": []}
+        for event in self.iter_analysis(video_path, **kwargs):
+            collected[event["type"]].extend(event["rows"])
+            if on_event is not None:
+                on_event(event)
+        timeline = sorted(collected["timeline"], key=lambda r: r["start_sec"])
+        return collected["objects"], collected["captions"], timeline
+
+    def analyze_video(
+        self,
+        video_path,
+        step=60,
+        output_csv="frame_metadata.csv",
+        sample_fps=None,
+        sampling="seek",
+        batch_size=YOLO_BATCH_SIZE,
+    ):
+        results_list, _, _ = self._analyze_pass(
+            video_path,
+            captions=False,
+            scenes=False,
+            step=step,
+            sample_fps=sample_fps,
+            sampling=sampling,
+            batch_size=batch_size,
+        )
 
         # Save all metadata to CSV
-        df_results = pd.DataFrame(results_list)
-        df_results.to_csv(csv_filepath, index=False)
-        print(f"Saved metadata for {len(df_results)} detections → {csv_filepath}")
+        csv_filepath = self._save_csv(results_list, output_csv)
+        print(f"Saved metadata for {len(results_list)} detections → {csv_filepath}")
         return results_list
 
     def detail_analyze_video(
@@ -79,6 +596,12 @@ class DataFromVideo:
         step=60,
         output_csv="detail_frame_metadata.csv",
         human_in_loop=False,
+        sample_fps=None,
+        sampling="seek",
+        batch_size=BLIP_BATCH_SIZE,
+        max_new_tokens=BLIP_MAX_NEW_TOKENS,
+        num_beams=BLIP_NUM_BEAMS,
+        dedupe_threshold=None,
     ):
         """
         Extract scene-level captions from a video using BLIP, with optional human review.
@@ -88,54 +611,30 @@ class DataFromVideo:
             step: Process every Nth frame
             output_csv: CSV to save frame metadata
             human_in_loop: If True, prompt user to review/edit captions
+            sample_fps: Frames per second of video to caption (overrides step)
+            sampling: "read", "grab" or "seek" (see _sample_frames)
+            batch_size: Frames captioned per generate() call
+            max_new_tokens: Caption length budget
+            num_beams: 1 for greedy decoding, >1 for beam search
+            dedupe_threshold: Reuse the previous caption for near-identical
+                frames (mean abs thumbnail difference, 0-255); None disables
         """
-        # Create imageData directory path
-        image_data_dir = os.path.join("test", "imageData")
-        os.makedirs(image_data_dir, exist_ok=True)
-        
-        # Create full path for CSV file
-        csv_filepath = os.path.join(image_data_dir, output_csv)
-        
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_num = 0
-        results_list = []
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_num % step == 0:
-                pil_frame = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                inputs = self.processor(pil_frame, return_tensors="pt")
-                with torch.no_grad():
-                    out = self.blip.generate(**inputs)
-                caption = self.processor.decode(out[0], skip_special_tokens=True)
-
-                if human_in_loop:
-                    print(f"\nFrame {frame_num} → BLIP Caption: {caption}")
-                    user_caption = input(
-                        "Edit caption or press Enter to accept: "
-                    ).strip()
-                    if user_caption:
-                        caption = user_caption
-
-                results_list.append(
-                    {
-                        "frame": frame_num,
-                        "timestamp_sec": frame_num / fps,
-                        "caption": caption,
-                    }
-                )
-
-                print(f"Frame {frame_num} → Final Caption: {caption}")
-
-            frame_num += 1
-
-        cap.release()
-        df_results = pd.DataFrame(results_list)
-        df_results.to_csv(csv_filepath, index=False)
+        _, results_list, _ = self._analyze_pass(
+            video_path,
+            objects=False,
+            scenes=False,
+            step=step,
+            sample_fps=sample_fps,
+            sampling=sampling,
+            caption_batch_size=batch_size,
+            caption_kwargs=dict(
+                human_in_loop=human_in_loop,
+                max_new_tokens=max_new_tokens,
+                num_beams=num_beams,
+                dedupe_threshold=dedupe_threshold,
+            ),
+        )
+        csv_filepath = self._save_csv(results_list, output_csv)
         print(f"Saved metadata for {len(results_list)} frames → {csv_filepath}")
         return results_list
 
@@ -145,6 +644,8 @@ class DataFromVideo:
         chunk_seconds=5,
         num_frames=16,
         output_csv="scene_timeline.csv",
+        batch_size=VIDEOMAE_BATCH_SIZE,
+        sampling="seek",
     ):
         """
         Classify dynamic actions/scenes over time using VideoMAE.
@@ -155,72 +656,101 @@ class DataFromVideo:
             chunk_seconds: length of each chunk (default 10s)
             num_frames: number of frames sampled per chunk
             output_csv: where to save results
+            batch_size: chunks stacked per VideoMAE forward pass
+            sampling: "read", "grab" or "seek" (see _sample_frames)
         """
-        # Create imageData directory path
-        image_data_dir = os.path.join("test", "imageData")
-        os.makedirs(image_data_dir, exist_ok=True)
-        
-        # Create full path for CSV file
-        csv_filepath = os.path.join(image_data_dir, output_csv)
-        
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        video_duration = total_frames / fps
-
-        results_list = []
-
-        # process each chunk
-        chunk_start = 0
-        while chunk_start < video_duration:
-            start_frame = int(chunk_start * fps)
-            end_frame = int(min((chunk_start + chunk_seconds) * fps, total_frames - 1))
-            frame_indices = np.linspace(start_frame, end_frame, num_frames, dtype=int)
+        _, _, results_list = self._analyze_pass(
+            video_path,
+            objects=False,
+            captions=False,
+            sampling=sampling,
+            chunk_seconds=chunk_seconds,
+            num_frames=num_frames,
+            clip_batch_size=batch_size,
+        )
 
-            frames = []
-            for idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                if ret:
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frames.append(frame)
-
-            if frames:
-                inputs = self.video_processor(frames, return_tensors="pt")
-                with torch.no_grad():
-                    outputs = self.videomae(**inputs)
-                    logits = outputs.logits
-                    predicted_class = logits.argmax(-1).item()
-                    
-                    # Calculate confidence score using softmax
-                    probabilities = torch.softmax(logits, dim=-1)
-                    confidence = probabilities[0][predicted_class].item()
-
-                label = self.videomae.config.id2label[predicted_class]
-                print(
-                    f"Chunk {chunk_start:.1f}s–{chunk_start+chunk_seconds:.1f}s → {label} (confidence: {confidence:.3f})"
-                )
+        csv_filepath = self._save_csv(results_list, output_csv)
+        print(f"Saved {len(results_list)} scene chunks → {csv_filepath}")
+        return results_list
 
-                results_list.append(
-                    {
-                        "start_sec": chunk_start,
-                        "end_sec": min(chunk_start + chunk_seconds, video_duration),
-                        "scene_label": label,
-                        "confidence": round(confidence, 3),
-                    }
-                )
+    def analyze_all(
+        self,
+        video_path,
+        step=60,
+        chunk_seconds=5,
+        num_frames=16,
+        human_in_loop=False,
+        sample_fps=None,
+        sampling="seek",
+        batch_size=YOLO_BATCH_SIZE,
+        caption_batch_size=BLIP_BATCH_SIZE,
+        clip_batch_size=VIDEOMAE_BATCH_SIZE,
+        max_new_tokens=BLIP_MAX_NEW_TOKENS,
+        num_beams=BLIP_NUM_BEAMS,
+        dedupe_threshold=None,
+        save_csv=True,
+        adaptive=False,
+        on_event=None,
+    ):
+        """
+        Run YOLO, BLIP and VideoMAE over a single pass through the video.
+        Equivalent to calling analyze_video, detail_analyze_video and
+        scene_understanding_timeline, but every frame is decoded at most once.
 
-            chunk_start += chunk_seconds
+        Args:
+            video_path: path to video file
+            step: Process every Nth frame for YOLO/BLIP
+            chunk_seconds: length of each VideoMAE chunk
+            num_frames: number of frames sampled per VideoMAE chunk
+            human_in_loop: If True, prompt user to review/edit captions
+            sample_fps: Frames per second of video for YOLO/BLIP (overrides step)
+            sampling: "read", "grab" or "seek" (see _sample_frames)
+            batch_size: sampled frames per YOLO forward pass
+            caption_batch_size: sampled frames per BLIP generate() call
+            clip_batch_size: chunks stacked per VideoMAE forward pass
+            max_new_tokens, num_beams, dedupe_threshold: see detail_analyze_video
+            save_csv: write the legacy CSVs to test/imageData/ (the pipeline
+                passes False and persists to its per-job AnalysisStore)
+            adaptive: sample per detected shot instead of every `step` frames
+                and align VideoMAE chunks to shots (see detect_shots)
+            on_event: called with each partial-result event as batches finish
+                (see iter_analysis)
+
+        Returns: (result_list, detail_list, timeline)
+        """
+        result_list, detail_list, timeline = self._analyze_pass(
+            video_path,
+            step=step,
+            sample_fps=sample_fps,
+            sampling=sampling,
+            chunk_seconds=chunk_seconds,
+            num_frames=num_frames,
+            batch_size=batch_size,
+            caption_batch_size=caption_batch_size,
+            clip_batch_size=clip_batch_size,
+            caption_kwargs=dict(
+                human_in_loop=human_in_loop,
+                max_new_tokens=max_new_tokens,
+                num_beams=num_beams,
+                dedupe_threshold=dedupe_threshold,
+            ),
+            adaptive=adaptive,
+            on_event=on_event,
+        )
 
-        cap.release()
+        if not save_csv:
+            return result_list, detail_list, timeline
 
-        df_results = pd.DataFrame(results_list)
-        df_results.to_csv(csv_filepath, index=False)
-        print(f"Saved {len(results_list)} scene chunks → {csv_filepath}")
-        return results_list
+        objects_csv = self._save_csv(result_list, "frame_metadata.csv")
+        captions_csv = self._save_csv(detail_list, "detail_frame_metadata.csv")
+        timeline_csv = self._save_csv(timeline, "scene_timeline.csv")
+        print(f"Saved metadata for {len(result_list)} detections → {objects_csv}")
+        print(f"Saved metadata for {len(detail_list)} frames → {captions_csv}")
+        print(f"Saved {len(timeline)} scene chunks → {timeline_csv}")
+        return result_list, detail_list, timeline
 
 
 # video_path = "/home/bkhwaja/hackathons/Mit_Hacks/backend/test/videos/beach.mp4"
 # meta_data = DataFromVideo()
 # result_list = meta_data.analyze_video(video_path, step=30)
-# detail_list = meta_data.detail_analyze_video(video_path, step=30)
\ No newline at end of file
+# detail_list = meta_data.detail_analyze_video(video_path, step=30)
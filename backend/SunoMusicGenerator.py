@@ -1,30 +1,216 @@
 import os
+import asyncio
+import random
+import threading
 import requests
+import httpx
 import json
-import time
-from typing import Optional, Dict, Any
+import math
+import struct
+import wave
+from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
+from generationCache import track_cache, make_key
+
+DEFAULT_BASE_URL = "https://studio-api.prod.suno.com/api/v2/external/hackmit"
+
+# Download read size bounds; see _download_chunk_size
+DOWNLOAD_MIN_CHUNK = 64 * 1024
+DOWNLOAD_MAX_CHUNK = 1024 * 1024
+
+
+def _extract_audio_url(clip: Dict[str, Any]) -> Optional[str]:
+    candidate = clip.get("audio_url")
+    # Plain http too: local/stub servers (SUNO_BASE_URL) serve audio without TLS
+    if isinstance(candidate, str) and candidate.startswith(("https://", "http://")):
+        return candidate
+    return None
+
+
+def _guess_extension(url: str, content_type: str) -> str:
+    # Determine extension heuristically
+    if "audio/mpeg" in content_type or url.lower().endswith(".mp3"):
+        return "mp3"
+    elif "wav" in content_type or url.lower().endswith(".wav"):
+        return "wav"
+    elif "mpeg" in content_type:
+        return "mp3"
+    elif ".ogg" in url.lower() or "ogg" in content_type:
+        return "ogg"
+    # fallback: try to infer from URL path
+    path = url.split("?")[0]
+    if "." in path:
+        return path.split(".")[-1].split("/")[0]
+    return "bin"
+
+
+def _download_chunk_size(content_length: Optional[str]) -> int:
+    # ~16 reads per file when the size is known, within [64 KiB, 1 MiB]
+    try:
+        size = int(content_length)
+    except (TypeError, ValueError):
+        return 4 * DOWNLOAD_MIN_CHUNK
+    return max(DOWNLOAD_MIN_CHUNK, min(DOWNLOAD_MAX_CHUNK, size // 16))
+
+
+def _resolve_credentials(api_key: Optional[str], base_url: Optional[str]) -> Tuple[str, str]:
+    # Recommended: set via env var instead of hardcoding
+    load_dotenv(".env.local")
+
+    api_key = api_key or os.environ.get("SUNO_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "SUNO_API_KEY not found in environment variables or provided directly"
+        )
+    # SUNO_BASE_URL lets tests point the client at a local stub server
+    base_url = base_url or os.environ.get("SUNO_BASE_URL", DEFAULT_BASE_URL)
+    return api_key, base_url.rstrip("/")
+
+
+class ClipPollScheduler:
+    """
+    Shared status poller for outstanding Suno clips.
+
+    Instead of one poll loop per clip, every waiting clip id goes into a
+    single /clips?ids=a,b,c request per tick, and waiters are resolved as
+    their clips complete (or time out). The tick delay adapts to an
+    exponential moving average of observed time-to-complete: no polls until
+    a clip is expected to be close to done, then backoff from min_interval
+    while it's overdue, capped at max_interval and jittered so many
+    workers don't poll in lockstep.
+    """
+
+    def __init__(
+        self,
+        fetch_clips,
+        min_interval: float = 1.0,
+        max_interval: float = 10.0,
+        initial_estimate: float = 20.0,
+        jitter: float = 0.2,
+    ):
+        """
+        Args:
+            fetch_clips: async callable(list of ids) -> list of clip dicts
+            min_interval: shortest delay between ticks (seconds)
+            max_interval: longest delay between ticks (seconds)
+            initial_estimate: time-to-complete guess before any clip finished
+            jitter: +/- fraction applied to every delay
+        """
+        self._fetch_clips = fetch_clips
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.estimate = initial_estimate
+        self.jitter = jitter
+        self._waiters: Dict[str, Dict[str, Any]] = {}
+        self._task = None
+
+    async def wait(self, clip_id: str, timeout: float = 120.0) -> Dict[str, Any]:
+        """
+        Resolve with the completed clip, or the last clip seen on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = self._waiters.get(clip_id)
+        if waiter is None:
+            now = loop.time()
+            waiter = {
+                "future": loop.create_future(),
+                "started": now,
+                "deadline": now + timeout,
+                "overdue_polls": 0,
+                "last": {},
+            }
+            self._waiters[clip_id] = waiter
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return await asyncio.shield(waiter["future"])
+
+    def _next_delay(self, now: float) -> float:
+        delays = []
+        for waiter in self._waiters.values():
+            expected_in = waiter["started"] + 0.8 * self.estimate - now
+            if expected_in > 0:
+                delay = expected_in
+            else:
+                delay = self.min_interval * (1.5 ** waiter["overdue_polls"])
+            delays.append(min(delay, max(waiter["deadline"] - now, 0.0)))
+        delay = min(max(min(delays), self.min_interval), self.max_interval)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _resolve(self, clip_id: str, clip: Dict[str, Any]) -> None:
+        waiter = self._waiters.pop(clip_id)
+        if not waiter["future"].done():
+            waiter["future"].set_result(clip)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            await asyncio.sleep(self._next_delay(loop.time()))
+
+            ids = list(self._waiters)
+            try:
+                clips = await self._fetch_clips(ids)
+            except Exception as e:
+                print(f"Polling clips {ids} error: {e}")
+                clips = []
+            by_id = {c.get("id"): c for c in clips if isinstance(c, dict)}
+
+            now = loop.time()
+            for clip_id in ids:
+                waiter = self._waiters[clip_id]
+                clip = by_id.get(clip_id)
+                if clip is not None:
+                    waiter["last"] = clip
+                    print(f"{clip_id} status={clip.get('status')}")
+                if clip is not None and clip.get("status") == "complete":
+                    # EMA of time-to-complete drives the next waits
+                    self.estimate = 0.7 * self.estimate + 0.3 * (now - waiter["started"])
+                    self._resolve(clip_id, clip)
+                elif now >= waiter["deadline"]:
+                    print(f"Polling {clip_id} timed out. Returning last clip object.")
+                    self._resolve(clip_id, waiter["last"])
+                elif now - waiter["started"] >= 0.8 * self.estimate:
+                    waiter["overdue_polls"] += 1
+
+
+# (api_key, base_url) -> (event loop thread, AsyncSunoMusicGenerator)
+_POLLERS: Dict[Tuple[str, str], Tuple[asyncio.AbstractEventLoop, Any]] = {}
+_POLLERS_LOCK = threading.Lock()
+
+
+def _shared_poller(api_key: str, base_url: str):
+    """
+    One background event loop + async client per (api_key, base_url), shared
+    by every sync SunoMusicGenerator in the process so that polls from
+    concurrent jobs batch into the same requests.
+    """
+    key = (api_key, base_url)
+    with _POLLERS_LOCK:
+        if key not in _POLLERS:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="suno-poller", daemon=True
+            ).start()
+
+            async def _make_client():
+                return AsyncSunoMusicGenerator(api_key=api_key, base_url=base_url)
+
+            client = asyncio.run_coroutine_threadsafe(_make_client(), loop).result()
+            _POLLERS[key] = (loop, client)
+        return _POLLERS[key]
 
 
 class SunoMusicGenerator:
-    def __init__(self):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         """
         Initialize the Suno Music Generator.
 
         Args:
             api_key: Suno API key. If None, will try to get from SUNO_API_KEY environment variable.
-            base_url: Base URL for the Suno API. Defaults to the HackMIT endpoint you had.
+            base_url: Base URL for the Suno API. If None, uses SUNO_BASE_URL or the HackMIT endpoint.
         """
-        # Recommended: set via env var instead of hardcoding
-        load_dotenv(".env.local")
-
-        self.api_key = os.environ.get("SUNO_API_KEY")
-        if not self.api_key:
-            raise ValueError(
-                "SUNO_API_KEY not found in environment variables or provided directly"
-            )
-
-        self.base_url = "https://studio-api.prod.suno.com/api/v2/external/hackmit"
+        self.api_key, self.base_url = _resolve_credentials(api_key, base_url)
+        # Reuse one keep-alive connection pool for every API call
+        self.session = requests.Session()
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -61,7 +247,7 @@ class SunoMusicGenerator:
             payload["tags"] = tags
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/generate",
                 headers=self.headers,
                 json=payload,
@@ -124,39 +310,20 @@ class SunoMusicGenerator:
         self, clip_id: str, poll_interval: float = 3.0, timeout: float = 120.0
     ) -> Dict[str, Any]:
         """
-        Poll the clip endpoint until it's ready or timeout.
+        Wait until the clip is ready or timeout.
 
+        The clip is handed to the process-wide ClipPollScheduler, which polls
+        every outstanding clip (from all generators/threads) in one
+        /clips?ids= request per tick with adaptive backoff. poll_interval is
+        kept for compatibility; the cadence is now adaptive.
 
         Returns the latest clip JSON response.
         """
-        t0 = time.time()
-        last_clip = {}
-        tried_endpoints = [
-            f"{self.base_url}/clips?ids={clip_id}",
-        ]
-        time.sleep(5)
-        while True:
-            for endpoint in tried_endpoints:
-                try:
-                    r = requests.get(endpoint, headers=self.headers, timeout=15)
-                    if r.ok:
-                        clip = r.json()
-                        last_clip = clip
-                        # print(clip)
-                        output = clip[0]
-                        status = output.get("status")
-                        print(f"status={status}")
-                        if status == "complete":
-                            return output
-                except Exception as e:
-                    print(f"Polling endpoint {endpoint} error: {e}")
-
-            # check timeout
-            if time.time() - t0 > timeout:
-                print("Polling timed out. Returning last clip object.")
-                return last_clip
-
-            time.sleep(poll_interval)
+        loop, poller = _shared_poller(self.api_key, self.base_url)
+        future = asyncio.run_coroutine_threadsafe(
+            poller.scheduler.wait(clip_id, timeout=timeout), loop
+        )
+        return future.result()
 
     def _extract_audio_url_from_clip(self, clip: Dict[str, Any]) -> Optional[str]:
         """
@@ -164,12 +331,7 @@ class SunoMusicGenerator:
         Modify this function if the Suno docs specify a particular field name.
         """
         # Direct fields
-
-        candidate = clip.get("audio_url")
-        if candidate and isinstance(candidate, str) and candidate.startswith("https"):
-            return candidate
-
-        return None
+        return _extract_audio_url(clip)
 
     def _download_file_from_url(self, url: str, clip_id: str) -> str:
         """
@@ -180,29 +342,16 @@ class SunoMusicGenerator:
             with requests.get(url, stream=True, timeout=60) as r:
                 r.raise_for_status()
                 content_type = r.headers.get("content-type", "")
-                # Determine extension heuristically
-                ext = None
-                if "audio/mpeg" in content_type or url.lower().endswith(".mp3"):
-                    ext = "mp3"
-                elif "wav" in content_type or url.lower().endswith(".wav"):
-                    ext = "wav"
-                elif "mpeg" in content_type:
-                    ext = "mp3"
-                elif ".ogg" in url.lower() or "ogg" in content_type:
-                    ext = "ogg"
-                else:
-                    # fallback: try to infer from URL path
-                    path = url.split("?")[0]
-                    if "." in path:
-                        ext = path.split(".")[-1].split("/")[0]
-                    else:
-                        ext = "bin"
+                ext = _guess_extension(url, content_type)
 
                 filename = os.path.join(self.download_dir, f"{clip_id}.{ext}")
-                with open(filename, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
+                chunk_size = _download_chunk_size(r.headers.get("content-length"))
+                # Write to .part and rename so readers never see a partial file
+                with open(filename + ".part", "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
                         if chunk:
                             f.write(chunk)
+                os.replace(filename + ".part", filename)
             print(f"Downloaded audio to {filename}")
             return filename
         except Exception as e:
@@ -244,10 +393,304 @@ class SunoMusicGenerator:
 
         return clip_info["id"]
 
+    def generate_track(self, prompt="", tags="", timeout=180.0,
+                       use_cache=True) -> Dict[str, Any]:
+        """
+        Generate, wait for and download a track in one call.
+
+        Returns the clip info including local_path, so the merge stage can
+        use the downloaded file directly instead of polling the filesystem.
+        Tracks are memoized on the normalized (prompt, tags) while the
+        downloaded file still exists; use_cache=False always generates a new
+        track (and caches it for later callers). Raises if no audio could be
+        downloaded.
+        """
+        cache_key = make_key(self.base_url, prompt, tags)
+        if use_cache:
+            cached = track_cache.get(cache_key)
+            if cached is not None and os.path.exists(cached["local_path"]):
+                print(f"[cache] Suno track hit: {cached['id']}")
+                return dict(cached)
+
+        result = self.generate_music(
+            prompt=prompt,
+            tags=tags,
+            make_instrumental=True,
+            poll_interval=3.0,
+            timeout=timeout,
+        )
+        clip_info = result["clips"][0]
+        if "local_path" not in clip_info:
+            raise RuntimeError(
+                result.get("download_error")
+                or f"Clip {clip_info['id']} not downloaded (status={clip_info.get('status')})"
+            )
+        print(f"Clip ID: {clip_info['id']} → {clip_info['local_path']}")
+        track_cache.put(cache_key, dict(clip_info))
+        return clip_info
+
     def remix_suno(covera_clip_id=""):
         pass
 
 
+class StubSunoMusicGenerator(SunoMusicGenerator):
+    """
+    Offline stand-in for tests: "generates" a short sine tone WAV locally,
+    with the same result shape as SunoMusicGenerator.generate_music.
+    """
+
+    def __init__(self, duration: float = 10.0, sample_rate: int = 44100):
+        self.api_key = None
+        self.base_url = "stub://suno"
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.download_dir = "test/downloads"
+        os.makedirs(self.download_dir, exist_ok=True)
+
+    def generate_music(self, prompt: str, tags: Optional[str] = None,
+                       make_instrumental: bool = True, poll_interval: float = 3.0,
+                       timeout: float = 120.0) -> Dict[str, Any]:
+        if not prompt or prompt.strip() == "":
+            raise ValueError("Prompt is required")
+
+        clip_id = "stub-" + make_key(prompt, tags)[:12]
+        local_path = os.path.join(self.download_dir, f"{clip_id}.wav")
+        # Pitch derived from the prompt so different prompts sound different
+        freq = 220.0 + int(clip_id[5:9], 16) % 440
+        n = int(self.duration * self.sample_rate)
+        frames = b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * freq * i / self.sample_rate)))
+            for i in range(n)
+        )
+        with wave.open(local_path + ".part", "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(frames)
+        os.replace(local_path + ".part", local_path)
+
+        return {
+            "success": True,
+            "clips": [{"id": clip_id, "status": "complete", "local_path": local_path}],
+        }
+
+
+def create_music_generator(**kwargs) -> SunoMusicGenerator:
+    """
+    The generator selected by SUNO_BACKEND ("suno", or "stub" to render a
+    local test tone instead of calling the API). Read at call time, after
+    .env.local is loaded.
+    """
+    load_dotenv(".env.local")
+    if os.environ.get("SUNO_BACKEND", "suno") == "stub":
+        return StubSunoMusicGenerator(**kwargs)
+    return SunoMusicGenerator(**kwargs)
+
+
+class AsyncSunoMusicGenerator:
+    """
+    asyncio Suno client. Every API call and download goes through one pooled
+    httpx.AsyncClient, so a single worker can keep many generations in
+    flight and poll them concurrently instead of sleeping in a thread.
+
+    Usage:
+        async with AsyncSunoMusicGenerator() as suno:
+            clip_ids = await suno.prompt_many([("lofi beach", "background"), ...])
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        poll_min_interval: float = 1.0,
+        poll_max_interval: float = 10.0,
+    ):
+        """
+        Args:
+            api_key: Suno API key. If None, will try to get from SUNO_API_KEY environment variable.
+            base_url: Base URL for the Suno API (e.g. a local stub server in tests).
+            max_connections: Size of the shared connection pool.
+            transport: Optional httpx transport (e.g. httpx.MockTransport for tests).
+            poll_min_interval, poll_max_interval: bounds for ClipPollScheduler ticks.
+        """
+        self.api_key, self.base_url = _resolve_credentials(api_key, base_url)
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        self.download_dir = "test/downloads"
+        os.makedirs(self.download_dir, exist_ok=True)
+        # Auth headers are passed per API call so they never leak to the CDN
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+        self.scheduler = ClipPollScheduler(
+            self._fetch_clips,
+            min_interval=poll_min_interval,
+            max_interval=poll_max_interval,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def generate_music(
+        self,
+        prompt: str,
+        tags: Optional[str] = None,
+        make_instrumental: bool = True,
+        poll_interval: float = 3.0,
+        timeout: float = 120.0,
+    ) -> Dict[str, Any]:
+        """
+        Async equivalent of SunoMusicGenerator.generate_music; same return shape.
+        """
+        if not prompt or prompt.strip() == "":
+            raise ValueError("Prompt is required")
+
+        payload = {"topic": prompt, "make_instrumental": make_instrumental}
+        if tags:
+            payload["tags"] = tags
+
+        response = await self.client.post(
+            f"{self.base_url}/generate", headers=self.headers, json=payload
+        )
+        if response.is_error:
+            raise httpx.HTTPStatusError(
+                f"Failed to start song generation: {response.status_code}: {response.text}",
+                request=response.request,
+                response=response,
+            )
+
+        clip = response.json()
+        print(f"Suno API response: {json.dumps(clip, indent=2)}")
+
+        clip_id = clip.get("id")
+        if not clip_id:
+            raise ValueError("Invalid response from Suno API: missing 'id'")
+
+        ready_clip = await self._poll_for_clip(
+            clip_id, poll_interval=poll_interval, timeout=timeout
+        )
+
+        audio_url = _extract_audio_url(ready_clip)
+        if not audio_url:
+            return {
+                "success": True,
+                "clips": [
+                    {
+                        "id": clip_id,
+                        "status": ready_clip.get("status"),
+                        "created_at": ready_clip.get("created_at"),
+                    }
+                ],
+                "download_error": "No audio URL found in clip metadata. Inspect clip object.",
+            }
+
+        local_path = await self._download_file_from_url(audio_url, clip_id)
+        return {
+            "success": True,
+            "clips": [
+                {
+                    "id": clip_id,
+                    "status": ready_clip.get("status"),
+                    "created_at": ready_clip.get("created_at"),
+                    "local_path": local_path,
+                }
+            ],
+        }
+
+    async def _fetch_clips(self, clip_ids: List[str]) -> List[Dict[str, Any]]:
+        r = await self.client.get(
+            f"{self.base_url}/clips",
+            params={"ids": ",".join(clip_ids)},
+            headers=self.headers,
+            timeout=15,
+        )
+        r.raise_for_status()
+        return r.json()
+
+    async def _poll_for_clip(
+        self, clip_id: str, poll_interval: float = 3.0, timeout: float = 120.0
+    ) -> Dict[str, Any]:
+        """
+        Wait on the shared ClipPollScheduler until the clip is ready or timeout.
+        poll_interval is kept for compatibility; the cadence is adaptive.
+        Returns the latest clip JSON response.
+        """
+        return await self.scheduler.wait(clip_id, timeout=timeout)
+
+    async def _download_file_from_url(self, url: str, clip_id: str) -> str:
+        """
+        Stream-download a file from URL to downloads/<clip_id>.<ext>
+        """
+        try:
+            async with self.client.stream("GET", url, timeout=60) as r:
+                r.raise_for_status()
+                ext = _guess_extension(url, r.headers.get("content-type", ""))
+                filename = os.path.join(self.download_dir, f"{clip_id}.{ext}")
+                chunk_size = _download_chunk_size(r.headers.get("content-length"))
+                with open(filename + ".part", "wb") as f:
+                    async for chunk in r.aiter_bytes(chunk_size=chunk_size):
+                        f.write(chunk)
+                os.replace(filename + ".part", filename)
+            print(f"Downloaded audio to {filename}")
+            return filename
+        except Exception as e:
+            print(f"Error downloading file from {url}: {e}")
+            raise
+
+    async def prompt_suno(self, prompt: str = "", tags: str = "") -> str:
+        result = await self.generate_music(
+            prompt=prompt,
+            tags=tags,
+            make_instrumental=True,
+            poll_interval=3.0,
+            timeout=180.0,  # wait up to 3 minutes
+        )
+        clip_info = result["clips"][0]
+        print(f"Clip ID: {clip_info['id']} status={clip_info.get('status')}")
+        return clip_info["id"]
+
+    async def generate_track(self, prompt: str = "", tags: str = "",
+                             timeout: float = 180.0) -> Dict[str, Any]:
+        """
+        Async equivalent of SunoMusicGenerator.generate_track.
+        """
+        result = await self.generate_music(
+            prompt=prompt, tags=tags, make_instrumental=True, timeout=timeout
+        )
+        clip_info = result["clips"][0]
+        if "local_path" not in clip_info:
+            raise RuntimeError(
+                result.get("download_error")
+                or f"Clip {clip_info['id']} not downloaded (status={clip_info.get('status')})"
+            )
+        return clip_info
+
+    async def prompt_many(self, prompts: List[Tuple[str, str]]) -> List[Any]:
+        """
+        Run several (prompt, tags) generations concurrently on the shared pool.
+        Returns clip ids in request order; a failed generation yields its exception.
+        """
+        return await asyncio.gather(
+            *(self.prompt_suno(prompt, tags) for prompt, tags in prompts),
+            return_exceptions=True,
+        )
+
+
 if __name__ == "__main__":
     prompt = "A relaxing jazz song about a rainy evening, hard stop at 15 seconds"
     tags = "jazz, chill, piano"
@@ -1,40 +1,147 @@
 import os
+import re
+import subprocess
+import threading
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 from DataFromVideo import DataFromVideo
-from SunoMusicGenerator import SunoMusicGenerator
+from SunoMusicGenerator import create_music_generator
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.audio.io.AudioFileClip import AudioFileClip
 from moviepy.audio.fx import AudioLoop
-import time
+from moviepy.config import FFMPEG_BINARY
+from audioAnalysis import decode_audio
+from generationCache import prompt_cache, make_key
+from analysisSummary import summarize_analysis, format_summary
+
+# Video codecs an MP4 container can carry as-is (stream copy, no re-encode)
+MP4_COPY_CODECS = {"h264", "hevc", "h265", "mpeg4", "av1", "vp9"}
+
+# Mixing mode: PCM format, music level and ducking under speech
+MIX_SAMPLE_RATE = 48000
+MIX_CHANNELS = 2
+MUSIC_GAIN = 0.5  # generated track level under the original audio
+DUCK_GAIN = 0.3  # extra multiplier on the music while someone is talking
+SPEECH_THRESHOLD = 0.5  # CLAP speech probability that counts as talking
+SPEECH_FLOOR_DB = -45.0  # quieter windows never duck, whatever CLAP says
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _openai_client(key: str) -> OpenAI:
+    # One client (and connection pool) per API key for the whole process
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = OpenAI(api_key=key)
+            _CLIENTS[key] = client
+        return client
+
+
+def _stub_prompt(instructions: str, user_input: str) -> str:
+    # Deterministic stand-in for the LLM: a short prompt built from the input
+    words = re.findall(r"[a-z]+", user_input.lower())
+    return f"Instrumental background music, {' '.join(words[:8]) or 'calm'}"
 
 
 def prompt_gpt(
-    instructions: str, user_input: str, key: str, model: str = "gpt-3.5-turbo"
+    instructions: str,
+    user_input: str,
+    key: str,
+    model: str = "gpt-3.5-turbo",
+    use_cache: bool = True,
 ) -> str:
     """
     Send a prompt to GPT using the new Responses API.
 
+    Answers are memoized on the normalized (model, instructions, input), so
+    an identical or near-identical analysis skips the round trip.
+
+    LLM_BACKEND=stub answers locally (no OpenAI key or network needed). It is
+    read per call, so a value from .env.local applies once it has been loaded.
+
     Args:
         instructions: System-level instructions (e.g., "You are a helpful assistant.")
         user_input: The user's question or prompt
-        model: The model to use (default: gpt-4o)
+        model: The model to use (default: gpt-3.5-turbo)
+        use_cache: look up the answer in the prompt cache (a fresh answer is
+            stored either way, so later callers get the newest one)
 
     Returns:
         The response text from GPT
     """
-    client = OpenAI(api_key=key)
+    backend = os.environ.get("LLM_BACKEND", "openai")
+    cache_key = make_key(backend, model, instructions, user_input)
+    if use_cache:
+        answer = prompt_cache.get(cache_key)
+        if answer is not None:
+            print("[cache] GPT prompt hit")
+            return answer
+
+    if backend == "stub":
+        answer = _stub_prompt(instructions, user_input)
+    else:
+        client = _openai_client(key)
+        response = client.responses.create(
+            model=model, instructions=instructions, input=user_input
+        )
+        # Extract text output (supports multi-part messages)
+        # response.output_text is a shortcut for the full text
+        answer = response.output_text
+
+    if answer:
+        prompt_cache.put(cache_key, answer)
+    return answer
 
-    response = client.responses.create(
-        model=model, instructions=instructions, input=user_input
+
+def _probe_video(video_path):
+    """
+    Read duration (s) and video codec from ffmpeg's stream banner without
+    decoding anything. Returns (duration or None, codec name or None).
+    """
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", video_path],
+        capture_output=True,
+        text=True,
     )
+    banner = proc.stderr
+    duration = None
+    m = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", banner)
+    if m:
+        h, mnt, sec = m.groups()
+        duration = int(h) * 3600 + int(mnt) * 60 + float(sec)
+    m = re.search(r"Stream #\d+:\d+.*?: Video: (\w+)", banner)
+    codec = m.group(1).lower() if m else None
+    return duration, codec
 
-    # Extract text output (supports multi-part messages)
-    # response.output_text is a shortcut for the full text
-    return response.output_text
+
+def _merge_stream_copy(video_path, audio_path, output_path, duration):
+    """
+    Remux: copy the original video stream untouched, loop/trim the
+    soundtrack to the video length and encode only that to AAC.
+    Returns True on success.
+    """
+    cmd = [
+        FFMPEG_BINARY, "-y", "-nostdin", "-loglevel", "error",
+        "-i", video_path,
+        "-stream_loop", "-1", "-i", audio_path,  # loop short tracks
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac", "-b:a", "192k",
+        "-t", f"{duration:.3f}",  # trim to the video length
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"Stream-copy mux failed, falling back to re-encode: {proc.stderr.strip()}")
+        return False
+    return True
 
 
-def merge_music_and_video(video_path="", audio_path=""):
+def _merge_reencode(video_path, audio_path, output_path):
     video = VideoFileClip(video_path)
     video_duration = video.duration
 
@@ -53,10 +160,11 @@ def merge_music_and_video(video_path="", audio_path=""):
     # print("Background audio duration:", background_audio)
 
     final_video.write_videofile(
-        "output_video.mp4",
+        output_path,
         codec="libx264",
         audio_codec="aac",
-        temp_audiofile="temp-audio.m4a",
+        # per-output temp file so concurrent merges don't clobber each other
+        temp_audiofile=os.path.splitext(output_path)[0] + "-temp-audio.m4a",
         remove_temp=True,
         preset="medium",
         fps=video.fps,
@@ -64,6 +172,140 @@ def merge_music_and_video(video_path="", audio_path=""):
     )
 
 
+def duck_envelope(
+    n_samples,
+    sr,
+    speech_windows=None,
+    music_gain=MUSIC_GAIN,
+    duck_gain=DUCK_GAIN,
+    speech_threshold=SPEECH_THRESHOLD,
+    floor_db=SPEECH_FLOOR_DB,
+):
+    """
+    Per-sample music gain: music_gain everywhere, times duck_gain inside
+    windows that are loud enough and likely speech (audioAnalysis.speech_timeline).
+    Window gains sit at window centres and are linearly interpolated, which
+    gives smooth ramps in and out of each duck.
+    """
+    if not speech_windows:
+        return np.full(n_samples, music_gain, dtype=np.float32)
+
+    centres = np.array([(w["t0"] + w["t1"]) / 2 for w in speech_windows]) * sr
+    talking = np.array(
+        [w["speech"] >= speech_threshold and w["rms_db"] > floor_db for w in speech_windows]
+    )
+    gains = np.where(talking, music_gain * duck_gain, music_gain)
+    return np.interp(np.arange(n_samples), centres, gains).astype(np.float32)
+
+
+def mix_tracks(source, music, envelope):
+    """
+    source + music * envelope for (n, channels) float32 PCM, looping or
+    trimming the music to the source length. Clipped to [-1, 1].
+    """
+    n = len(source)
+    reps = -(-n // len(music))  # ceil
+    music = np.tile(music, (reps, 1))[:n] if reps > 1 else music[:n]
+    mixed = source + music * envelope[:, None]
+    np.clip(mixed, -1.0, 1.0, out=mixed)
+    return mixed
+
+
+def _merge_mix(video_path, audio_path, output_path, duration, codec, speech_windows,
+               music_gain=MUSIC_GAIN, duck_gain=DUCK_GAIN):
+    """
+    Keep the original audio and lay the generated track under it, ducked
+    under speech. Both tracks are decoded to PCM, mixed in one vectorized
+    NumPy step and piped into ffmpeg next to the (copied) video stream.
+    The source audio is padded with silence or trimmed to the video
+    duration, so the video is never cut short by an early-ending track.
+    Returns False if the source has no audio or the mux fails.
+    """
+    source = decode_audio(video_path, MIX_SAMPLE_RATE, MIX_CHANNELS)
+    if source is None:
+        return False
+    if duration:
+        n = int(round(duration * MIX_SAMPLE_RATE))
+        if len(source) < n:
+            source = np.pad(source, ((0, n - len(source)), (0, 0)))
+        else:
+            source = source[:n]
+    else:
+        duration = len(source) / MIX_SAMPLE_RATE
+    music = decode_audio(audio_path, MIX_SAMPLE_RATE, MIX_CHANNELS)
+    if music is None:
+        raise ValueError(f"Generated track has no audio: {audio_path}")
+
+    envelope = duck_envelope(len(source), MIX_SAMPLE_RATE, speech_windows,
+                             music_gain=music_gain, duck_gain=duck_gain)
+    mixed = mix_tracks(source, music, envelope)
+
+    video_codec = ["-c:v", "copy"] if codec in MP4_COPY_CODECS else [
+        "-c:v", "libx264", "-preset", "medium"
+    ]
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-i", video_path,
+        "-f", "f32le", "-ar", str(MIX_SAMPLE_RATE), "-ac", str(MIX_CHANNELS),
+        "-i", "pipe:0",
+        "-map", "0:v:0", "-map", "1:a:0",
+        *video_codec,
+        "-c:a", "aac", "-b:a", "192k",
+        "-t", f"{duration:.3f}",  # the video length, like _merge_stream_copy
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    proc = subprocess.run(cmd, input=mixed.tobytes(), capture_output=True)
+    if proc.returncode != 0:
+        print(f"Mix mux failed: {proc.stderr.decode(errors='replace').strip()}")
+        return False
+    return True
+
+
+def merge_music_and_video(
+    video_path="",
+    audio_path="",
+    output_path="output_video.mp4",
+    mode="copy",
+    mix=False,
+    speech_windows=None,
+    music_gain=MUSIC_GAIN,
+    duck_gain=DUCK_GAIN,
+):
+    """
+    Put the generated track under the video.
+
+    Args:
+        video_path: Source video
+        audio_path: Generated track (looped or trimmed to the video length)
+        output_path: Output MP4
+        mode: "copy" keeps the original video stream and only encodes the
+              audio (falls back to re-encoding when the codec can't go in an
+              MP4 or the remux fails); "reencode" always re-encodes H.264
+        mix: Keep the original audio and add the track at music_gain instead
+             of replacing it (falls back to replacing when there is no audio)
+        speech_windows: audioAnalysis.speech_timeline() output; the music is
+             further scaled by duck_gain where it detects speech
+    """
+    if mix:
+        duration, codec = _probe_video(video_path)
+        if _merge_mix(video_path, audio_path, output_path, duration, codec, speech_windows,
+                      music_gain=music_gain, duck_gain=duck_gain):
+            return output_path
+        print("Mixing unavailable, replacing the original audio instead")
+
+    if mode == "copy":
+        duration, codec = _probe_video(video_path)
+        if duration and codec in MP4_COPY_CODECS:
+            if _merge_stream_copy(video_path, audio_path, output_path, duration):
+                return output_path
+        else:
+            print(f"Video codec {codec!r} needs re-encoding for MP4 output")
+
+    _merge_reencode(video_path, audio_path, output_path)
+    return output_path
+
+
 # Example usage
 if __name__ == "__main__":
     instructions = """
@@ -74,12 +316,12 @@ Output only the music prompt text, nothing else.
 """
     video_path = "/home/bkhwaja/hackathons/Mit_Hacks/backend/test/videos/beach.mp4"
     meta_data = DataFromVideo()
-    result_list = meta_data.analyze_video(video_path, step=120)
-    detail_list = meta_data.detail_analyze_video(video_path, step=120)
-    timeline = meta_data.scene_understanding_timeline(video_path, chunk_seconds=5)
-    user_input = (
-        f"objects={result_list}, scene labels={detail_list}, action labels={timeline}"
+    # One decode pass for all three models
+    result_list, detail_list, timeline = meta_data.analyze_all(
+        video_path, step=120, chunk_seconds=5
     )
+    summary = summarize_analysis(result_list, detail_list, timeline)
+    user_input = f"ANALYSIS SUMMARY:\n{format_summary(summary)}"
     # Initialize client
     load_dotenv(".env.local")
     key = os.environ.get("GPT_KEY")
@@ -87,21 +329,7 @@ Output only the music prompt text, nothing else.
     print(answer)
     video_prompt = answer
     tags = "background"
-    suno = SunoMusicGenerator()
-    clip_id = suno.prompt_suno(video_prompt, tags)
-    audio_path = (
-        f"/home/bkhwaja/hackathons/Mit_Hacks/backend/test/downloads/{clip_id}.mp3"
-    )
-    # audio_path = f"backend/test/downloads/{clip_id}.mp3"
-    # Wait for the audio file to be created (max 60 seconds)
-    timeout = 60
-    waited = 0
-    while not os.path.exists(audio_path) and waited < timeout:
-        print(f"Waiting for audio file {audio_path} to be created...")
-        time.sleep(2)
-        waited += 2
-
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"Audio file not found after waiting: {audio_path}")
+    suno = create_music_generator()
+    audio_path = suno.generate_track(video_prompt, tags)["local_path"]
     merge_music_and_video(video_path, audio_path)
     # return {"message": "Success on creating the audio file."}
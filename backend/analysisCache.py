@@ -0,0 +1,168 @@
+"""
+Content-addressed cache for analysis results.
+
+Entries are keyed by a hash of the video bytes plus the stage name, model
+checkpoints and analysis parameters, so re-uploading or regenerating on the
+same video skips YOLO/BLIP/VideoMAE/CLAP entirely, while a changed model or
+parameter (step, chunk_seconds, num_segments, labels, ...) misses cleanly.
+
+Entries are pickles in CACHE_DIR. Each hit bumps the file's mtime and the
+least recently used entries are evicted once the directory grows past
+CACHE_MAX_MB, so the cache survives restarts and is shared by every worker
+on the host.
+
+Config (env):
+  ANALYSIS_CACHE_DIR     cache directory (default test/cache/analysis)
+  ANALYSIS_CACHE_MAX_MB  size bound in MB; 0 disables the cache (default 512)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", os.path.join("test", "cache", "analysis"))
+CACHE_MAX_MB = float(os.environ.get("ANALYSIS_CACHE_MAX_MB", "512"))
+
+# Bump when the shape of cached results changes
+CACHE_FORMAT = 2
+
+HASH_CHUNK = 1 << 20
+
+_DIGESTS: Dict[Tuple[str, int, int], str] = {}
+_DIGEST_LOCK = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of the file's bytes. Memoized on (path, size, mtime) so the
+    video and audio stages of one job hash the upload only once.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    with _DIGEST_LOCK:
+        digest = _DIGESTS.get(memo_key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    with _DIGEST_LOCK:
+        _DIGESTS[memo_key] = digest
+    return digest
+
+
+def cache_key(digest: str, stage: str, **params) -> str:
+    """
+    Key for one stage's results on one input. params must be JSON-serializable
+    (lists, numbers, strings); include every model id and setting that
+    changes the output.
+    """
+    payload = json.dumps(
+        {"format": CACHE_FORMAT, "input": digest, "stage": stage, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return f"{stage}-{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class AnalysisCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_mb: float = CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Cached value for key, or None on a miss (or an unreadable entry).
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Dropping unreadable cache entry {key}: {e}")
+            self._remove(path)
+            return None
+        # Bump recency for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries():
+                self._remove(entry[2])
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Shared by the analysis stages
+analysis_cache = AnalysisCache()
@@ -0,0 +1,317 @@
+"""
+Analysis stages of the video -> music pipeline.
+
+The visual stage (YOLO/BLIP/VideoMAE) and the audio mood stage (CLAP) share
+no data, so run_analysis_stages() runs them side by side in a thread pool
+and joins both before the prompt step. Torch and OpenCV release the GIL in
+their kernels, so the stages genuinely overlap and end-to-end latency
+tracks the slowest stage instead of the sum.
+
+Both stages go through the content-addressed analysis cache
+(analysisCache.py), so a repeat run on the same video skips inference.
+When given an AnalysisStore (analysisStore.py), the stages persist their
+timelines to it instead of writing CSVs.
+
+Partial results are published as they are produced: every finished model
+batch (or CLAP segment) is appended to the store and passed to the
+optional on_event callback as {"stage", "type", "rows", "progress"}.
+
+Config (env, read by main.py):
+  ANALYSIS_WORKERS   worker threads for the stage pool (default 2)
+  VIDEO_STAGE_CPUS   CPU list to pin the video stage to, e.g. "0-23"
+  AUDIO_STAGE_CPUS   CPU list to pin the audio stage to, e.g. "24-31"
+  (per-stage torch thread counts come from computeBudget.py)
+  ADAPTIVE_SAMPLING  1 = shot-driven frame sampling in the video stage (default 1;
+                     0 = fixed step/chunk grid, see DataFromVideo.detect_shots)
+  VIDEO_SAMPLE_FPS   YOLO/BLIP frames per second of video on the fixed grid
+                     (default 0.25, i.e. one every 4 s at any frame rate)
+  VIDEO_SAMPLING     "seek" (default), "grab" or "read" (see DataFromVideo._sample_frames)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import torch
+
+from DataFromVideo import (
+    DataFromVideo,
+    YOLO_REPO,
+    YOLO_MODEL,
+    BLIP_MODEL,
+    VIDEOMAE_MODEL,
+    BLIP_MAX_NEW_TOKENS,
+    BLIP_NUM_BEAMS,
+    SHOT_THUMB_SIZE,
+    SHOT_THRESHOLD,
+    SHOT_MIN_SEC,
+    SHOT_SAMPLE_GAP_SEC,
+)
+from audioAnalysis import (
+    iter_audio_segments,
+    save_sentiment_data,
+    extract_audio_16k_mono,
+    SAMPLE_RATE,
+    MODEL_NAME as CLAP_MODEL,
+    DEFAULT_LABELS,
+    HYPOTHESIS,
+    SPEECH_LABELS,
+    SPEECH_HYPOTHESIS,
+    WIN_SEC,
+    HOP_SEC,
+)
+from analysisCache import analysis_cache, cache_key, file_digest
+from analysisStore import AnalysisStore
+from inferenceBackend import inference_backend
+from computeBudget import apply_thread_budget
+
+
+def parse_cpu_list(spec: Optional[str]) -> Optional[List[int]]:
+    """
+    "0-3,8" -> [0, 1, 2, 3, 8]. Empty/None -> None (no pinning).
+    """
+    if not spec or not spec.strip():
+        return None
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def _run_pinned(cpus: Optional[Iterable[int]], threads: Optional[int], fn, *args, **kwargs):
+    # Pool threads are reused (ANALYSIS_WORKERS=1 runs both stages on one),
+    # so restore the thread's affinity and torch threads after the stage
+    can_pin = bool(cpus) and hasattr(os, "sched_setaffinity")
+    prev_cpus = os.sched_getaffinity(0) if can_pin else None
+    prev_threads = torch.get_num_threads()
+    # On Linux affinity is per thread, so pid 0 pins only this worker thread
+    if can_pin:
+        try:
+            os.sched_setaffinity(0, set(cpus))
+        except OSError as e:
+            print(f"[WARNING] Could not pin {fn.__name__} to CPUs {cpus}: {e}")
+    # A pinned stage defaults to one intra-op thread per pinned CPU
+    apply_thread_budget(threads or (len(set(cpus)) if cpus else None))
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        torch.set_num_threads(prev_threads)
+        if prev_cpus is not None:
+            try:
+                os.sched_setaffinity(0, prev_cpus)
+            except OSError:
+                pass
+
+
+def _publisher(stage: str, store: Optional[AnalysisStore], on_event: Optional[Callable]):
+    # Route one partial-result event to the store and the caller's callback
+    def emit(event: Dict) -> None:
+        if store is not None:
+            store.append(event["type"], event["rows"])
+        if on_event is not None:
+            on_event(dict(event, stage=stage))
+    return emit
+
+
+def video_stage(video_path: str, step: int = 120, chunk_seconds: int = 5,
+                store: Optional[AnalysisStore] = None, adaptive: bool = False,
+                on_event: Optional[Callable] = None, num_frames: int = 16,
+                sample_fps: Optional[float] = None, sampling: str = "seek",
+                max_new_tokens: int = BLIP_MAX_NEW_TOKENS,
+                num_beams: int = BLIP_NUM_BEAMS,
+                dedupe_threshold: Optional[float] = None):
+    """
+    YOLO objects, BLIP captions and VideoMAE timeline in one decode pass
+    (after a shot-detection pre-pass when adaptive=True).
+    Results are appended to store when given (batch by batch), otherwise
+    saved as CSVs; on_event receives each batch as it finishes.
+    sample_fps samples YOLO/BLIP frames by time instead of every step
+    frames; sampling="seek" skips decoding across keyframes (see
+    DataFromVideo._sample_frames). The remaining arguments are passed to
+    DataFromVideo.analyze_all.
+    Returns: (result_list, detail_list, timeline)
+    """
+    print("\n1. Running Video Analysis...")
+    key = cache_key(
+        file_digest(video_path),
+        "video",
+        models=[f"{YOLO_REPO}/{YOLO_MODEL}", BLIP_MODEL, VIDEOMAE_MODEL],
+        backends=[inference_backend(name) for name in ("yolo", "blip", "videomae")],
+        step=step,
+        chunk_seconds=chunk_seconds,
+        num_frames=num_frames,
+        sample_fps=sample_fps,
+        sampling=sampling,
+        max_new_tokens=max_new_tokens,
+        num_beams=num_beams,
+        dedupe_threshold=dedupe_threshold,
+        adaptive=adaptive,
+        shots=["keyframes", list(SHOT_THUMB_SIZE), SHOT_THRESHOLD,
+               SHOT_MIN_SEC, SHOT_SAMPLE_GAP_SEC] if adaptive else None,
+    )
+    emit = _publisher("video", store, on_event)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        result_list, detail_list, timeline = cached
+        print("   ✓ Video analysis loaded from cache")
+        for kind, rows in (("objects", result_list), ("captions", detail_list), ("timeline", timeline)):
+            emit({"type": kind, "rows": rows, "progress": 1.0})
+    else:
+        result_list, detail_list, timeline = DataFromVideo().analyze_all(
+            video_path, step=step, chunk_seconds=chunk_seconds,
+            num_frames=num_frames, sample_fps=sample_fps, sampling=sampling,
+            max_new_tokens=max_new_tokens, num_beams=num_beams,
+            dedupe_threshold=dedupe_threshold,
+            save_csv=store is None, adaptive=adaptive, on_event=emit,
+        )
+        analysis_cache.put(key, (result_list, detail_list, timeline))
+    print(f"   ✓ Video analysis complete: {len(result_list)} objects, {len(detail_list)} scenes, {len(timeline)} timeline chunks")
+    return result_list, detail_list, timeline
+
+
+def audio_stage(video_path: str, num_segments: int = 4,
+                speech: bool = False,
+                store: Optional[AnalysisStore] = None,
+                on_event: Optional[Callable] = None) -> Tuple[List[Dict], Optional[str], Optional[List[Dict]]]:
+    """
+    CLAP mood analysis of the video's audio track, plus the per-window
+    speech/loudness timeline used for ducking when speech=True.
+    Results are appended to store when given (segment by segment),
+    otherwise saved as a CSV; on_event receives each segment as it finishes.
+    Returns: (audio_results, audio_path, speech_windows), where audio_path
+    is where the mood results were saved; ([], None, None) when there is
+    no audio or the analysis fails.
+    """
+    print("\n2. Running Audio Analysis...")
+    audio_results = []
+    audio_csv_path = store.path if store is not None else None
+    speech_windows = None
+    emit = _publisher("audio", store, on_event)
+
+    try:
+        digest = file_digest(video_path)
+        mood_key = cache_key(
+            digest,
+            "audio",
+            model=CLAP_MODEL,
+            backend=inference_backend("clap"),
+            labels=DEFAULT_LABELS,
+            hypothesis=HYPOTHESIS,
+            win_sec=WIN_SEC,
+            hop_sec=HOP_SEC,
+            num_segments=num_segments,
+        )
+        speech_key = cache_key(
+            digest,
+            "speech",
+            model=CLAP_MODEL,
+            backend=inference_backend("clap"),
+            labels=SPEECH_LABELS,
+            hypothesis=SPEECH_HYPOTHESIS,
+            win_sec=WIN_SEC,
+            hop_sec=HOP_SEC,
+            num_segments=num_segments,
+        )
+        cached_results = analysis_cache.get(mood_key)
+        if speech:
+            speech_windows = analysis_cache.get(speech_key)
+
+        if cached_results is not None and (not speech or speech_windows is not None):
+            audio_results = cached_results
+            print(f"   ✓ Audio analysis loaded from cache: {len(audio_results)} segments")
+            emit({"type": "audio", "rows": audio_results, "progress": 1.0})
+        else:
+            # Extract audio from video (16 kHz mono, in memory)
+            audio = extract_audio_16k_mono(video_path)
+            if audio is None:
+                raise ValueError("video has no audio track")
+            print(f"   ✓ Audio extracted: {len(audio) / SAMPLE_RATE:.1f}s")
+
+            # Analyze audio segments; speech is scored from the same CLAP
+            # audio embeddings, so a speech miss re-runs the one pass for both
+            speech_windows = [] if speech else None
+            for segment in iter_audio_segments(audio, num_segments=num_segments, speech=speech):
+                if speech:
+                    speech_windows.extend(segment.pop("speech_windows"))
+                audio_results.append(segment)
+                emit({
+                    "type": "audio",
+                    "rows": [segment],
+                    "progress": round(len(audio_results) / num_segments, 3),
+                })
+            analysis_cache.put(mood_key, audio_results)
+            print(f"   ✓ Audio analysis complete: {len(audio_results)} segments analyzed")
+
+            if speech:
+                analysis_cache.put(speech_key, speech_windows)
+                print(f"   ✓ Speech timeline: {len(speech_windows)} windows")
+
+        if speech_windows:
+            emit({"type": "speech", "rows": speech_windows, "progress": 1.0})
+        if store is None:
+            # Save audio analysis to CSV
+            audio_csv_path = save_sentiment_data(audio_results, video_path)
+        print(f"   ✓ Audio results saved to: {audio_csv_path}")
+
+    except Exception as e:
+        print(f"   ✗ Audio analysis failed: {e}")
+        audio_results = []
+
+    return audio_results, audio_csv_path, speech_windows
+
+
+def run_analysis_stages(video_path: str,
+                        step: int = 120,
+                        chunk_seconds: int = 5,
+                        num_segments: int = 4,
+                        speech: bool = False,
+                        max_workers: int = 2,
+                        affinity: Optional[Dict[str, Iterable[int]]] = None,
+                        store: Optional[AnalysisStore] = None,
+                        adaptive: bool = False,
+                        on_event: Optional[Callable] = None,
+                        threads: Optional[Dict[str, int]] = None,
+                        sample_fps: Optional[float] = None,
+                        sampling: str = "seek"):
+    """
+    Run the video and audio stages concurrently and wait for both.
+
+    Args:
+        speech: also compute the speech timeline for ducking (see audio_stage)
+        max_workers: stage pool size (1 runs the stages one after the other)
+        affinity: optional {"video": cpus, "audio": cpus} pinning per stage
+        store: per-job AnalysisStore both stages persist to
+        adaptive: shot-driven sampling in the video stage (see video_stage)
+        on_event: receives partial results from both stages as they finish
+            (called from the stage threads)
+        threads: optional {"video": n, "audio": n} torch intra-op threads per
+            stage (see computeBudget.plan_thread_budget)
+        sample_fps, sampling: video stage frame sampling (see video_stage)
+
+    Returns: ((result_list, detail_list, timeline),
+              (audio_results, audio_csv_path, speech_windows))
+    """
+    affinity = affinity or {}
+    threads = threads or {}
+    stages = {
+        "video": (video_stage, (video_path, step, chunk_seconds, store, adaptive, on_event),
+                  {"sample_fps": sample_fps, "sampling": sampling}),
+        "audio": (audio_stage, (video_path, num_segments, speech, store, on_event), {}),
+    }
+
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix="analysis") as pool:
+        futures = {
+            name: pool.submit(
+                _run_pinned, affinity.get(name), threads.get(name), fn, *args, **kwargs
+            )
+            for name, (fn, args, kwargs) in stages.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    return results["video"], results["audio"]
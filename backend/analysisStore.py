@@ -0,0 +1,166 @@
+"""
+Per-job analysis store.
+
+Each job gets its own directory holding every analysis timeline as typed
+columnar NumPy archives instead of pandas CSVs at shared fixed paths, so
+parallel jobs never overwrite each other and readers (prompt, mux, API)
+load typed columns without CSV parsing.
+
+Writes are append-only: every append() adds a new part file
+<table>.<seq>.npz (written to a temp name, then renamed), and read()
+concatenates a table's parts in order. Timeline batches finish out of
+order, so read() sorts tables listed in SORT_KEYS by that column.
+
+Layout:
+  <ANALYSIS_DIR>/<job_id>/objects.00000.npz
+  <ANALYSIS_DIR>/<job_id>/captions.00000.npz
+  ...
+"""
+
+import os
+import re
+import threading
+import zipfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ANALYSIS_DIR = os.environ.get("ANALYSIS_DIR", os.path.join("test", "analysis"))
+
+# Typed schema per table: column -> dtype. "U" columns are variable width.
+# Floats are float64 so values come back exactly as the analyzers rounded them.
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "objects": {"frame": "int32", "timestamp_sec": "float64", "class": "U"},
+    "captions": {"frame": "int32", "timestamp_sec": "float64", "caption": "U"},
+    "timeline": {
+        "start_sec": "float64",
+        "end_sec": "float64",
+        "scene_label": "U",
+        "confidence": "float64",
+    },
+    "audio": {
+        "segment": "int16",
+        "start_time": "float64",
+        "end_time": "float64",
+        "duration": "float64",
+        "top_mood": "U",
+        "confidence": "float64",
+        "top_2_mood": "U",
+        "confidence_2": "float64",
+        "mood_3": "U",
+        "score_3": "float64",
+        "timestamp": "U",
+    },
+    "speech": {"t0": "float64", "t1": "float64", "rms_db": "float64", "speech": "float64"},
+}
+
+# Tables whose parts are not appended in time order
+SORT_KEYS = {"timeline": "start_sec"}
+
+_PART_RE = re.compile(r"^(?P<table>\w+)\.(?P<seq>\d+)\.npz$")
+
+
+def _column(values: List, dtype: str) -> np.ndarray:
+    if dtype == "U":
+        return np.asarray([str(v) for v in values], dtype=str)
+    return np.asarray(values, dtype=dtype)
+
+
+def _part_rows(part: str, column: str) -> int:
+    # Row count from the .npy header of one column; no array data is read
+    with zipfile.ZipFile(part) as archive, archive.open(f"{column}.npy") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape = np.lib.format.read_array_header_1_0(f)[0]
+        else:
+            shape = np.lib.format.read_array_header_2_0(f)[0]
+    return shape[0]
+
+
+class AnalysisStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._next_seq = {}
+        for name in os.listdir(path):
+            m = _PART_RE.match(name)
+            if m:
+                table, seq = m.group("table"), int(m.group("seq"))
+                self._next_seq[table] = max(self._next_seq.get(table, 0), seq + 1)
+
+    def _parts(self, table: str) -> List[str]:
+        parts = []
+        for name in os.listdir(self.path):
+            m = _PART_RE.match(name)
+            if m and m.group("table") == table:
+                parts.append((int(m.group("seq")), name))
+        return [os.path.join(self.path, name) for _, name in sorted(parts)]
+
+    def append(self, table: str, rows: List[Dict]) -> Optional[str]:
+        """
+        Append rows (dicts with at least the schema's columns; extra keys are
+        ignored) as a new part of table. Returns the part path, or None
+        when there is nothing to write.
+        """
+        schema = SCHEMAS[table]
+        if not rows:
+            return None
+        columns = {
+            col: _column([row[col] for row in rows], dtype)
+            for col, dtype in schema.items()
+        }
+        with self._lock:
+            seq = self._next_seq.get(table, 0)
+            self._next_seq[table] = seq + 1
+        part = os.path.join(self.path, f"{table}.{seq:05d}.npz")
+        tmp = part + ".part"
+        with open(tmp, "wb") as f:
+            np.savez(f, **columns)
+        os.replace(tmp, part)
+        return part
+
+    def read(self, table: str) -> Dict[str, np.ndarray]:
+        """
+        All rows of table as typed columns {column: array}, in time order
+        for tables in SORT_KEYS.
+        """
+        schema = SCHEMAS[table]
+        chunks = {col: [] for col in schema}
+        for part in self._parts(table):
+            with np.load(part, allow_pickle=False) as data:
+                for col in schema:
+                    chunks[col].append(data[col])
+        columns = {
+            col: np.concatenate(arrays) if arrays else _column([], schema[col])
+            for col, arrays in chunks.items()
+        }
+        sort_key = SORT_KEYS.get(table)
+        if sort_key is not None:
+            order = np.argsort(columns[sort_key], kind="stable")
+            columns = {col: values[order] for col, values in columns.items()}
+        return columns
+
+    def rows(self, table: str) -> List[Dict]:
+        """
+        All rows of table as plain Python dicts (the analyzers' row format).
+        """
+        columns = self.read(table)
+        names = list(columns)
+        return [
+            dict(zip(names, values))
+            for values in zip(*(columns[col].tolist() for col in names))
+        ]
+
+    def tables(self) -> Dict[str, int]:
+        """
+        Row count per table present in the store, from the part headers
+        (no column data is loaded).
+        """
+        counts = {}
+        for table, schema in SCHEMAS.items():
+            parts = self._parts(table)
+            if parts:
+                column = next(iter(schema))
+                counts[table] = sum(_part_rows(part, column) for part in parts)
+        return counts
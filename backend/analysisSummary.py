@@ -0,0 +1,245 @@
+"""
+Compact, bounded-size summary of the analysis results for the LLM prompt.
+
+The raw analysis lists grow with video length (one dict per YOLO detection,
+one caption per sampled frame, one timeline chunk every few seconds), and
+used to be pasted into the prompt verbatim. summarize_analysis() folds them
+into the generation schema's summary block:
+
+  summary: { top_objects[], top_scenes[], sample_caps[] }
+
+plus a few bounded timelines (objects per time bucket, merged scene
+segments, audio moods), so prompt size no longer depends on video length.
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+# Size bounds for every list in the summary
+MAX_TOP_OBJECTS = 8
+MAX_TOP_SCENES = 5
+MAX_SAMPLE_CAPS = 6
+MAX_BUCKETS = 8
+MAX_OBJECTS_PER_BUCKET = 3
+MAX_SCENE_SEGMENTS = 10
+
+# Shortest object bucket; long videos get fewer, wider buckets
+MIN_BUCKET_SEC = 10.0
+
+
+def _duration(result_list, detail_list, timeline) -> float:
+    ends = [r.get("timestamp_sec", 0.0) for r in result_list]
+    ends += [r.get("timestamp_sec", 0.0) for r in detail_list]
+    ends += [r.get("end_sec", 0.0) for r in timeline]
+    return max(ends, default=0.0)
+
+
+def summarize_objects(result_list: List[Dict], duration: float) -> Dict:
+    """
+    Detections -> overall class counts and per-bucket top classes.
+    Returns {"top_objects": [...], "objects_by_time": [...]}
+    """
+    counts = Counter(r["class"] for r in result_list)
+    frames = defaultdict(set)
+    for r in result_list:
+        frames[r["class"]].add(r["frame"])
+
+    top_objects = [
+        {"class": cls, "count": n, "frames": len(frames[cls])}
+        for cls, n in counts.most_common(MAX_TOP_OBJECTS)
+    ]
+
+    bucket_sec = max(MIN_BUCKET_SEC, duration / MAX_BUCKETS) if duration else MIN_BUCKET_SEC
+    buckets = defaultdict(Counter)
+    for r in result_list:
+        idx = min(int(r["timestamp_sec"] // bucket_sec), MAX_BUCKETS - 1)
+        buckets[idx][r["class"]] += 1
+
+    objects_by_time = [
+        {
+            "start_sec": round(idx * bucket_sec, 1),
+            "end_sec": round((idx + 1) * bucket_sec, 1),
+            "objects": dict(buckets[idx].most_common(MAX_OBJECTS_PER_BUCKET)),
+        }
+        for idx in sorted(buckets)
+    ]
+    return {"top_objects": top_objects, "objects_by_time": objects_by_time}
+
+
+def summarize_captions(detail_list: List[Dict]) -> List[Dict]:
+    """
+    The MAX_SAMPLE_CAPS most frequent distinct captions (ties go to the
+    earlier one), in order of first appearance, with how many sampled
+    frames they describe: [{"caption", "count"}].
+    """
+    first = {}
+    counts = Counter()
+    for r in detail_list:
+        caption = " ".join(str(r.get("caption", "")).split())
+        key = caption.lower()
+        if not caption:
+            continue
+        if key not in first:
+            first[key] = (len(first), caption)
+        counts[key] += 1
+    ranked = sorted(counts, key=lambda k: (-counts[k], first[k][0]))[:MAX_SAMPLE_CAPS]
+    return [
+        {"caption": first[key][1], "count": counts[key]}
+        for key in sorted(ranked, key=lambda k: first[k][0])
+    ]
+
+
+def merge_scene_segments(timeline: List[Dict]) -> List[Dict]:
+    """
+    Merge adjacent timeline chunks that share a label; confidence becomes the
+    duration-weighted mean over the merged chunks.
+    """
+    segments = []
+    for chunk in sorted(timeline, key=lambda c: c["start_sec"]):
+        span = chunk["end_sec"] - chunk["start_sec"]
+        last = segments[-1] if segments else None
+        if last is not None and last["scene_label"] == chunk["scene_label"]:
+            last_span = last["end_sec"] - last["start_sec"]
+            total = last_span + span
+            if total > 0:
+                last["confidence"] = (last["confidence"] * last_span + chunk["confidence"] * span) / total
+            last["end_sec"] = chunk["end_sec"]
+        else:
+            segments.append(
+                {
+                    "start_sec": chunk["start_sec"],
+                    "end_sec": chunk["end_sec"],
+                    "scene_label": chunk["scene_label"],
+                    "confidence": chunk["confidence"],
+                }
+            )
+    for seg in segments:
+        seg["start_sec"] = round(seg["start_sec"], 1)
+        seg["end_sec"] = round(seg["end_sec"], 1)
+        seg["confidence"] = round(seg["confidence"], 3)
+    return segments
+
+
+def _spread_segments(segments: List[Dict], k: int) -> List[Dict]:
+    """
+    At most k segments covering the whole timeline: split it into k equal
+    time slots and keep, per slot, the segment overlapping it the most.
+    """
+    if len(segments) <= k:
+        return segments
+    start, end = segments[0]["start_sec"], segments[-1]["end_sec"]
+    slot = (end - start) / k
+    keep = set()
+    for i in range(k):
+        lo, hi = start + i * slot, start + (i + 1) * slot
+        overlaps = [
+            (min(hi, seg["end_sec"]) - max(lo, seg["start_sec"]), -j)
+            for j, seg in enumerate(segments)
+        ]
+        keep.add(-max(overlaps)[1])
+    return [segments[j] for j in sorted(keep)]
+
+
+def summarize_scenes(timeline: List[Dict]) -> Dict:
+    """
+    Returns {"top_scenes": [...], "scene_segments": [...]}. Labels are ranked
+    by total screen time; when there are too many segments, a spread of at
+    most MAX_SCENE_SEGMENTS across the whole video is kept (in time order).
+    """
+    segments = merge_scene_segments(timeline)
+
+    time_by_label = defaultdict(float)
+    weighted_conf = defaultdict(float)
+    for seg in segments:
+        span = seg["end_sec"] - seg["start_sec"]
+        time_by_label[seg["scene_label"]] += span
+        weighted_conf[seg["scene_label"]] += seg["confidence"] * span
+
+    ranked = sorted(time_by_label, key=time_by_label.get, reverse=True)
+    top_scenes = [
+        {
+            "scene_label": label,
+            "seconds": round(time_by_label[label], 1),
+            "confidence": round(weighted_conf[label] / time_by_label[label], 3)
+            if time_by_label[label] > 0 else 0.0,
+        }
+        for label in ranked[:MAX_TOP_SCENES]
+    ]
+
+    return {
+        "top_scenes": top_scenes,
+        "scene_segments": _spread_segments(segments, MAX_SCENE_SEGMENTS),
+    }
+
+
+def summarize_audio(audio_results: Optional[List[Dict]]) -> List[Dict]:
+    """
+    Audio segments without the per-window detail and analysis timestamps.
+    """
+    return [
+        {
+            "start_sec": r["start_time"],
+            "end_sec": r["end_time"],
+            "mood": r["top_mood"],
+            "confidence": r["confidence"],
+            "mood_2": r["top_2_mood"],
+            "confidence_2": r["confidence_2"],
+        }
+        for r in audio_results or []
+    ]
+
+
+def summarize_analysis(result_list: List[Dict],
+                       detail_list: List[Dict],
+                       timeline: List[Dict],
+                       audio_results: Optional[List[Dict]] = None) -> Dict:
+    """
+    Bounded summary of all analysis outputs.
+
+    Returns: {top_objects, top_scenes, sample_caps, objects_by_time,
+              scene_segments, audio_moods, duration_sec}
+    """
+    duration = _duration(result_list, detail_list, timeline)
+    summary = {"duration_sec": round(duration, 1)}
+    summary.update(summarize_objects(result_list, duration))
+    summary.update(summarize_scenes(timeline))
+    summary["sample_caps"] = summarize_captions(detail_list)
+    summary["audio_moods"] = summarize_audio(audio_results)
+    return summary
+
+
+def format_summary(summary: Dict) -> str:
+    """
+    Render a summary as the compact text block used in the GPT prompt.
+    """
+    lines = [f"Video length: {summary['duration_sec']}s"]
+
+    objects = ", ".join(f"{o['class']} x{o['count']}" for o in summary["top_objects"])
+    lines.append(f"- Top objects: {objects or 'none detected'}")
+    for bucket in summary["objects_by_time"]:
+        objs = ", ".join(f"{cls} x{n}" for cls, n in bucket["objects"].items())
+        lines.append(f"  {bucket['start_sec']}-{bucket['end_sec']}s: {objs}")
+
+    scenes = ", ".join(
+        f"{s['scene_label']} ({s['seconds']}s, conf {s['confidence']})"
+        for s in summary["top_scenes"]
+    )
+    lines.append(f"- Top scenes: {scenes or 'none'}")
+    for seg in summary["scene_segments"]:
+        lines.append(
+            f"  {seg['start_sec']}-{seg['end_sec']}s: {seg['scene_label']} (conf {seg['confidence']})"
+        )
+
+    captions = "; ".join(f"{c['caption']} (x{c['count']})" for c in summary["sample_caps"])
+    lines.append("- Scene descriptions (x sampled frames): " + (captions or "none"))
+
+    if summary["audio_moods"]:
+        lines.append("- Audio moods:")
+        for m in summary["audio_moods"]:
+            lines.append(
+                f"  {m['start_sec']}-{m['end_sec']}s: {m['mood']} (conf {m['confidence']}), "
+                f"{m['mood_2']} (conf {m['confidence_2']})"
+            )
+    else:
+        lines.append("- Audio moods: Not available")
+    return "\n".join(lines)
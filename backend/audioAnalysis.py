@@ -14,7 +14,7 @@ Why this design?
 Deps:
   pip install torch transformers moviepy librosa soundfile
 Note:
-  Ensure ffmpeg is installed (moviepy uses it).
+  Ensure ffmpeg is installed (moviepy uses it; audio is demuxed with the same binary).
 
 Usage:
   python audioAnalysis.py test/videos/beach_audio.mp4 [num_segments]
@@ -25,22 +25,27 @@ import io
 import sys
 import json
 import tempfile
+import subprocess
 import csv
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Iterator, Optional, Union
 from datetime import datetime
 
 import numpy as np
 import librosa
 import soundfile as sf
 import torch
-from transformers import pipeline
-from moviepy.video.io.VideoFileClip import VideoFileClip
+import torch.nn.functional as F
+from transformers import ClapModel, ClapProcessor
+from moviepy.config import FFMPEG_BINARY
+from modelRegistry import register_model, get_model
+from inferenceBackend import optimize_model
 
 # ---------------------- Config ----------------------
 MODEL_NAME = "laion/clap-htsat-unfused"  # CLAP zero-shot
 SAMPLE_RATE = 16000
 WIN_SEC = 5.0
 HOP_SEC = 2.5
+CLAP_BATCH_SIZE = 16  # audio windows per CLAP forward pass
 
 # Default moods (edit if you want, end users don't need to pass anything)
 DEFAULT_LABELS = [
@@ -51,63 +56,205 @@ DEFAULT_LABELS = [
 
 HYPOTHESIS = "The audio is {}."  # zero-shot template
 
+# Speech detection for music ducking (first label is the speech class)
+SPEECH_LABELS = ["people talking", "music", "ambient sound"]
+SPEECH_HYPOTHESIS = "This is a sound of {}."
 
-def extract_audio_16k_mono_to_temp(video_path: str) -> Optional[str]:
+
+def _load_clap():
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    processor = ClapProcessor.from_pretrained(MODEL_NAME)
+    model = ClapModel.from_pretrained(MODEL_NAME).to(device).eval()
+    return processor, optimize_model("clap", model, MODEL_NAME)
+
+
+# Built once per process and shared by every segment/request
+register_model("clap", _load_clap)
+
+# (labels, hypothesis) -> L2-normalized label text embeddings
+_TEXT_EMBEDDINGS: Dict[Tuple[Tuple[str, ...], str], torch.Tensor] = {}
+
+
+def clap_text_embeddings(labels: List[str], hypothesis: str) -> torch.Tensor:
     """
-    Extract audio from video to a temporary 16 kHz mono WAV and return its path.
+    Encode the zero-shot label prompts once per (labels, hypothesis) and cache.
+    """
+    key = (tuple(labels), hypothesis)
+    cached = _TEXT_EMBEDDINGS.get(key)
+    if cached is None:
+        processor, model = get_model("clap")
+        texts = [hypothesis.format(lab) for lab in labels]
+        inputs = processor.tokenizer(texts, padding=True, return_tensors="pt")
+        with torch.no_grad():
+            text_embeds = model.get_text_features(**inputs.to(model.device))
+        cached = F.normalize(text_embeds, dim=-1)
+        _TEXT_EMBEDDINGS[key] = cached
+    return cached
+
+
+def clap_audio_embeddings(windows: List[np.ndarray],
+                          batch_size: int = CLAP_BATCH_SIZE) -> torch.Tensor:
+    """
+    L2-normalized CLAP audio embeddings of many windows, batch_size windows
+    per audio-encoder pass. Score them against any label set with
+    clap_scores(), so one encoder pass serves several label sets.
+    """
+    processor, model = get_model("clap")
+    # The pipeline fed raw arrays to the extractor at its native rate; keep that
+    # so scores match what we've been producing.
+    feature_sr = processor.feature_extractor.sampling_rate
+
+    audio_embeds = []
+    for i in range(0, len(windows), batch_size):
+        batch = [w.astype(np.float32) for w in windows[i:i + batch_size]]
+        inputs = processor.feature_extractor(batch, sampling_rate=feature_sr,
+                                             return_tensors="pt")
+        with torch.no_grad():
+            audio_embeds.append(model.get_audio_features(**inputs.to(model.device)))
+    return F.normalize(torch.cat(audio_embeds), dim=-1)
+
+
+def clap_scores(audio_embeds: torch.Tensor, labels: List[str], hypothesis: str) -> np.ndarray:
+    """
+    Zero-shot scores of audio embeddings against the cached label embeddings
+    in one matmul (same logits/softmax as the zero-shot-audio-classification
+    pipeline).
+    Returns: (n_windows, n_labels) array of per-window label probabilities
+    """
+    _, model = get_model("clap")
+    text_embeds = clap_text_embeddings(labels, hypothesis)
+    with torch.no_grad():
+        logits = audio_embeds @ text_embeds.T * model.logit_scale_a.exp()
+        probs = logits.softmax(dim=-1)
+    return probs.cpu().numpy()
+
+
+def clap_window_scores(windows: List[np.ndarray],
+                       labels: List[str],
+                       hypothesis: str,
+                       batch_size: int = CLAP_BATCH_SIZE) -> np.ndarray:
+    """
+    Zero-shot CLAP scores for many audio windows at once.
+    Returns: (n_windows, n_labels) array of per-window label probabilities
+    """
+    return clap_scores(clap_audio_embeddings(windows, batch_size), labels, hypothesis)
+
+
+def _ffmpeg_pcm_cmd(video_path: str, sr: int = SAMPLE_RATE, channels: int = 1) -> List[str]:
+    # first audio stream -> float32 little-endian PCM on stdout
+    return [
+        FFMPEG_BINARY, "-nostdin", "-loglevel", "error",
+        "-i", video_path,
+        "-map", "0:a:0", "-vn",
+        "-ac", str(channels), "-ar", str(sr),
+        "-f", "f32le", "-",
+    ]
+
+
+def decode_audio(path: str, sr: int = SAMPLE_RATE, channels: int = 1) -> Optional[np.ndarray]:
+    """
+    Decode the first audio stream of any media file with a single ffmpeg
+    subprocess piped straight into a float32 NumPy buffer.
+    Returns (n,) for mono or (n, channels), or None if there is no audio track.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    proc = subprocess.run(_ffmpeg_pcm_cmd(path, sr, channels), capture_output=True)
+    if proc.returncode != 0:
+        err = proc.stderr.decode(errors="replace").strip()
+        if "matches no streams" in err:
+            print(f"[WARNING] Video has no audio track: {path}")
+        else:
+            print(f"[ERROR] Failed to extract audio: {err}")
+        return None
+
+    y = np.frombuffer(proc.stdout, dtype=np.float32)
+    if len(y) == 0:
+        print(f"[WARNING] Video has no audio track: {path}")
+        return None
+    return y if channels == 1 else y.reshape(-1, channels)
+
+
+def extract_audio_16k_mono(video_path: str) -> Optional[np.ndarray]:
+    """
+    Demux + resample the video's audio with a single ffmpeg subprocess piped
+    straight into a float32 NumPy buffer (16 kHz mono). Nothing touches disk.
     Returns None if video has no audio track.
     """
+    return decode_audio(video_path, SAMPLE_RATE, channels=1)
+
+
+def stream_audio_16k_mono(video_path: str, chunk_sec: float = 10.0) -> Iterator[np.ndarray]:
+    """
+    Like extract_audio_16k_mono, but yields chunk_sec-long float32 chunks as
+    ffmpeg produces them, so long files never need to be held in memory.
+    Yields nothing if video has no audio track.
+    """
     if not os.path.exists(video_path):
         raise FileNotFoundError(video_path)
 
-    clip = VideoFileClip(video_path)
-    if clip.audio is None:
-        clip.close()
-        print(f"[WARNING] Video has no audio track: {video_path}")
-        return None
-
+    chunk_bytes = int(chunk_sec * SAMPLE_RATE) * 4  # float32
+    proc = subprocess.Popen(_ffmpeg_pcm_cmd(video_path),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
     try:
-        # 1) demux to temp wav (16k) via moviepy/ffmpeg
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as t1:
-            tmp_wav_rough = t1.name
-        clip.audio.write_audiofile(tmp_wav_rough, fps=SAMPLE_RATE)
-        clip.close()
-
-        # 2) ensure mono 16k (robust) via librosa + soundfile
-        y, sr = librosa.load(tmp_wav_rough, sr=SAMPLE_RATE, mono=True)
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as t2:
-            tmp_wav = t2.name
-        sf.write(tmp_wav, y.astype(np.float32), samplerate=SAMPLE_RATE)
-
-        try:
-            os.remove(tmp_wav_rough)
-        except Exception:
-            pass
-
-        return tmp_wav
-    except Exception as e:
-        clip.close()
-        print(f"[ERROR] Failed to extract audio: {e}")
+        while True:
+            buf = proc.stdout.read(chunk_bytes)
+            if not buf:
+                break
+            yield np.frombuffer(buf, dtype=np.float32)
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+def extract_audio_16k_mono_to_temp(video_path: str) -> Optional[str]:
+    """
+    Extract audio from video to a temporary 16 kHz mono WAV and return its path.
+    Returns None if video has no audio track.
+    Prefer extract_audio_16k_mono(), which skips the file entirely.
+    """
+    y = extract_audio_16k_mono(video_path)
+    if y is None:
         return None
 
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as t:
+        tmp_wav = t.name
+    sf.write(tmp_wav, y, samplerate=SAMPLE_RATE)
+    return tmp_wav
+
+
+def load_mono(audio: Union[str, np.ndarray], sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Path -> decoded mono float32 at sr. An in-memory array is assumed to be
+    mono at sr already and is returned without copying when it's float32.
+    """
+    if isinstance(audio, str):
+        y, _ = librosa.load(audio, sr=sr, mono=True)
+        return y
+    return np.asarray(audio, dtype=np.float32)
+
 
-def score_labels_windowed_with_clap(audio_path: str,
+def score_labels_windowed_with_clap(audio: Union[str, np.ndarray],
                                     labels: List[str],
                                     hypothesis: str,
                                     sr: int = SAMPLE_RATE,
                                     win_sec: float = WIN_SEC,
-                                    hop_sec: float = HOP_SEC):
+                                    hop_sec: float = HOP_SEC,
+                                    speech: bool = False):
     """
-    1) Load audio 16 kHz mono
+    1) Load audio 16 kHz mono (or take an in-memory array/slice as-is)
     2) Loudness normalize
-    3) Slide windows -> CLAP zero-shot scores per window
+    3) Slide windows -> batched CLAP zero-shot scores for all windows
     4) Aggregate median score per label
+    With speech=True the same window embeddings are also scored against
+    SPEECH_LABELS, and each debug window gets "speech" (probability) and
+    "rms_db" (loudness before normalization).
     Returns: (per_label_scores_sorted, debug_windows)
     """
-    device = 0 if torch.cuda.is_available() else -1
-    clf = pipeline("zero-shot-audio-classification", model=MODEL_NAME, device=device)
-
-    y, _ = librosa.load(audio_path, sr=sr, mono=True)
+    y = raw = load_mono(audio, sr)
     if len(y) == 0:
         return [{"label": "silence", "score": 1.0}], []
 
@@ -124,62 +271,62 @@ def score_labels_windowed_with_clap(audio_path: str,
     hop = int(hop_sec * sr)
     n = len(y)
 
-    per_label_scores = {lab: [] for lab in labels}
-    debug_windows = []
-
+    starts = []
     for start in range(0, max(1, n - win + 1), hop):
-        seg = y[start:start+win]
-        if len(seg) < int(0.6 * win):
+        if len(y[start:start+win]) < int(0.6 * win):
             break  # ignore too-short tail
+        starts.append(start)
+    if not starts:
+        return [{"label": lab, "score": 0.0} for lab in labels], []
 
-        out = clf(seg.astype(np.float32),
-                  candidate_labels=labels, hypothesis_template=hypothesis)
-
-        # Normalize output variants to list of (label, score)
-        if isinstance(out, dict) and "labels" in out and "scores" in out:
-            window_scores = list(zip(out["labels"], out["scores"]))
-        elif isinstance(out, list):
-            window_scores = [(d["label"], d["score"]) for d in out]
-        else:
-            window_scores = [(out.get("label", "unknown"), out.get("score", 0.0))]
+    audio_embeds = clap_audio_embeddings([y[s0:s0+win] for s0 in starts])
+    scores = clap_scores(audio_embeds, labels, hypothesis)
 
-        # log a tiny debug record (optional)
-        t0 = start / sr; t1 = (start + win) / sr
+    # log a tiny debug record (optional)
+    debug_windows = []
+    for start, window_scores in zip(starts, scores):
+        top = np.argsort(-window_scores)[:3]
         debug_windows.append({
-            "t0": round(t0, 2),
-            "t1": round(t1, 2),
-            "top": sorted(window_scores, key=lambda x: -x[1])[:3]
+            "t0": round(start / sr, 2),
+            "t1": round(min(start + win, n) / sr, 2),
+            "top": [(labels[j], float(window_scores[j])) for j in top]
         })
 
-        # accumulate by label
-        for lab, sc in window_scores:
-            if lab in per_label_scores:
-                per_label_scores[lab].append(float(sc))
+    if speech:
+        speech_probs = clap_scores(audio_embeds, SPEECH_LABELS, SPEECH_HYPOTHESIS)
+        for start, record, p in zip(starts, debug_windows, speech_probs):
+            w = raw[start:start+win]
+            record["rms_db"] = round(float(20 * np.log10(np.sqrt(np.mean(w**2) + 1e-12))), 2)
+            record["speech"] = round(float(p[0]), 3)
 
     # aggregate with median (robust to spikes)
-    med = []
-    for lab in labels:
-        scores = per_label_scores.get(lab, [])
-        med.append({"label": lab, "score": float(np.median(scores)) if scores else 0.0})
+    medians = np.median(scores, axis=0)
+    med = [{"label": lab, "score": float(sc)} for lab, sc in zip(labels, medians)]
 
     med.sort(key=lambda d: d["score"], reverse=True)
     return med, debug_windows
 
 
-def analyze_audio_segments(audio_path: str, num_segments: int = 4) -> List[Dict]:
+def iter_audio_segments(audio: Union[str, np.ndarray], num_segments: int = 4,
+                        speech: bool = False) -> Iterator[Dict]:
     """
-    Split audio into equal segments and analyze each segment separately.
-    Returns list of results for each segment with timestamps.
+    Split audio into equal segments and analyze each segment separately,
+    yielding each segment's result as soon as its CLAP windows are scored.
+    `audio` is a file path or a 16 kHz mono array; segments are views into
+    the one decoded buffer, nothing is written back to disk.
+
+    With speech=True each result also carries "speech_windows": the
+    segment's windows as speech_timeline() rows (absolute times), scored
+    from the same CLAP audio embeddings as the moods.
     """
-    # Load audio to get duration
-    y, sr = librosa.load(audio_path, sr=SAMPLE_RATE, mono=True)
+    # Decode once (or reuse the caller's buffer) to get duration
+    y = load_mono(audio, SAMPLE_RATE)
+    sr = SAMPLE_RATE
     duration = len(y) / sr
     segment_duration = duration / num_segments
     
     print(f"Audio duration: {duration:.1f}s, splitting into {num_segments} segments of {segment_duration:.1f}s each")
     
-    segment_results = []
-    
     for i in range(num_segments):
         start_time = i * segment_duration
         end_time = (i + 1) * segment_duration
@@ -187,48 +334,73 @@ def analyze_audio_segments(audio_path: str, num_segments: int = 4) -> List[Dict]
         # Extract segment
         start_sample = int(start_time * sr)
         end_sample = int(end_time * sr)
-        segment_audio = y[start_sample:end_sample]
+        segment_audio = y[start_sample:end_sample]  # view, no copy
         
-        # Save segment to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-            segment_path = tmp_file.name
-        sf.write(segment_path, segment_audio.astype(np.float32), samplerate=SAMPLE_RATE)
+        # Analyze this segment
+        results, windows = score_labels_windowed_with_clap(
+            segment_audio,
+            labels=DEFAULT_LABELS,
+            hypothesis=HYPOTHESIS,
+            speech=speech,
+        )
         
-        try:
-            # Analyze this segment
-            results, _ = score_labels_windowed_with_clap(
-                segment_path,
-                labels=DEFAULT_LABELS,
-                hypothesis=HYPOTHESIS
-            )
-            
-            # Get top 2 moods for this segment
-            top_mood = results[0] if results else {"label": "unknown", "score": 0.0}
-            top_2_mood = results[1] if len(results) > 1 else {"label": "unknown", "score": 0.0}
-            
-            segment_info = {
-                "segment": i + 1,
-                "start_time": round(start_time, 2),
-                "end_time": round(end_time, 2),
-                "duration": round(segment_duration, 2),
-                "top_mood": top_mood["label"],
-                "top_2_mood": top_2_mood["label"],
-                "confidence": round(top_mood["score"], 3),
-                "confidence_2": round(top_2_mood["score"], 3),
-                "all_moods": results[:3],  # Top 3 moods for this segment
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            segment_results.append(segment_info)
-            
-        finally:
-            # Clean up segment file
-            try:
-                os.remove(segment_path)
-            except:
-                pass
-    
-    return segment_results
+        # Get top 2 moods for this segment
+        top_mood = results[0] if results else {"label": "unknown", "score": 0.0}
+        top_2_mood = results[1] if len(results) > 1 else {"label": "unknown", "score": 0.0}
+        top_3_mood = results[2] if len(results) > 2 else {"label": "unknown", "score": 0.0}
+        
+        segment_info = {
+            "segment": i + 1,
+            "start_time": round(start_time, 2),
+            "end_time": round(end_time, 2),
+            "duration": round(segment_duration, 2),
+            "top_mood": top_mood["label"],
+            "top_2_mood": top_2_mood["label"],
+            "confidence": round(top_mood["score"], 3),
+            "confidence_2": round(top_2_mood["score"], 3),
+            "mood_3": top_3_mood["label"],
+            "score_3": round(top_3_mood["score"], 3),
+            "all_moods": results[:3],  # Top 3 moods for this segment
+            "timestamp": datetime.now().isoformat()
+        }
+        if speech:
+            segment_info["speech_windows"] = [
+                {
+                    "t0": round(start_time + w["t0"], 2),
+                    "t1": round(start_time + w["t1"], 2),
+                    "rms_db": w["rms_db"],
+                    "speech": w["speech"],
+                }
+                for w in windows
+            ]
+        
+        yield segment_info
+
+
+def analyze_audio_segments(audio: Union[str, np.ndarray], num_segments: int = 4) -> List[Dict]:
+    """
+    Split audio into equal segments and analyze each segment separately.
+    Returns list of results for each segment with timestamps.
+    """
+    return list(iter_audio_segments(audio, num_segments=num_segments))
+
+
+def speech_timeline(audio: Union[str, np.ndarray], num_segments: int = 4) -> List[Dict]:
+    """
+    Per-window loudness and speech likelihood over the whole track, used to
+    duck generated music under dialogue when mixing (see VideoToMusic).
+
+    Comes from the mood pass: the windows of iter_audio_segments(speech=True)
+    are scored against SPEECH_LABELS from the same CLAP audio embeddings, so
+    the audio encoder runs once per window. Callers that also want the moods
+    should read each segment's "speech_windows" instead of calling this.
+    Returns: [{"t0", "t1", "rms_db", "speech"}] per window
+    """
+    return [
+        w
+        for segment in iter_audio_segments(audio, num_segments=num_segments, speech=True)
+        for w in segment["speech_windows"]
+    ]
 
 
 def save_sentiment_data(segment_results: List[Dict], video_path: str) -> Optional[str]:
@@ -295,18 +467,17 @@ def main():
         print(f"[ERROR] File not found: {video_path}")
         sys.exit(1)
 
-    tmp_audio = None
     try:
-        # 1) Extract audio automatically
-        tmp_audio = extract_audio_16k_mono_to_temp(video_path)
+        # 1) Extract audio automatically (in memory)
+        audio = extract_audio_16k_mono(video_path)
         
-        if tmp_audio is None:
+        if audio is None:
             print(f"[INFO] No audio track found in video: {video_path}")
             print("[INFO] Skipping audio analysis")
             return
 
         # 2) Analyze audio in segments
-        segment_results = analyze_audio_segments(tmp_audio, num_segments)
+        segment_results = analyze_audio_segments(audio, num_segments)
 
         # 3) Print segment analysis results
         print(f"\nAUDIO MOOD ANALYSIS - {num_segments} SEGMENTS")
@@ -342,13 +513,6 @@ def main():
         print(f"[ERROR] Audio analysis failed: {e}")
         return
 
-    finally:
-        if tmp_audio and os.path.exists(tmp_audio):
-            try:
-                os.remove(tmp_audio)
-            except Exception:
-                pass
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
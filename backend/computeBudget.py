@@ -0,0 +1,181 @@
+"""
+Central CPU thread budget for the analysis workers.
+
+Left alone, every torch model and OpenCV each size their thread pools to
+the whole machine. Two jobs, each running a video and an audio stage,
+then fight over the same cores and scale negatively. plan_thread_budget()
+splits the CPUs this process may use once:
+
+  cpus         min(affinity mask, cgroup CPU quota), or COMPUTE_CPUS
+  job_workers  concurrent jobs (JobQueue pool size)
+  per_job      cpus // job_workers
+  video/audio  per_job split between the two analysis stages
+  opencv       OpenCV's global pool (resize/cvtColor in frame preprocessing)
+  interop      torch inter-op pool (process-wide)
+
+configure_process() applies the process-wide parts once at startup, and
+apply_thread_budget() is called at the start of each worker thread.
+torch.set_num_threads also writes a process-wide default, and a thread
+sizes its OpenMP team from that default lazily, on its first parallel op.
+So apply_thread_budget() forces the calling thread's lazy init before
+setting its count. Otherwise the last thread to call set_num_threads would
+decide the team size of every thread that had not run an op yet. The ONNX
+Runtime session gets the video share explicitly (see inferenceBackend.py).
+
+Config (env):
+  COMPUTE_CPUS           CPUs to budget (default: auto-detect)
+  JOB_WORKERS            concurrent jobs (default: cpus // CPUS_PER_JOB, max 4)
+  AUDIO_STAGE_SHARE      fraction of a job's CPUs for the audio stage (default 0.25)
+  OPENCV_THREADS         OpenCV pool size (default: the video stage share)
+  TORCH_INTEROP_THREADS  torch inter-op threads (default 1)
+"""
+
+import os
+from typing import Dict, Optional
+
+import cv2
+import torch
+
+CPUS_PER_JOB = 8
+MAX_AUTO_JOB_WORKERS = 4
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+_CGROUP_V1_DIRS = ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct")
+_PROC_CGROUP = "/proc/self/cgroup"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _own_cgroups() -> Dict[str, str]:
+    """
+    This process's cgroup path per controller from /proc/self/cgroup
+    ("" for the unified v2 hierarchy), e.g. {"": "/system.slice/app.service"}.
+    """
+    paths = {}
+    for line in (_read(_PROC_CGROUP) or "").splitlines():
+        _, controllers, path = line.split(":", 2)
+        for controller in controllers.split(","):
+            paths[controller] = path
+    return paths
+
+
+def _ancestors(root: str, path: str):
+    # root/a/b, root/a, root: a quota on any ancestor applies to us too
+    parts = [p for p in path.split("/") if p]
+    for i in range(len(parts), -1, -1):
+        yield os.path.join(root, *parts[:i])
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """
+    CPU quota of this process's cgroup in cores (e.g. 2.5), or None when
+    unlimited or not in a cgroup. The tightest quota on the cgroup or any
+    of its ancestors wins. Supports cgroup v2 (cpu.max) and v1 (cfs quota).
+    """
+    cgroups = _own_cgroups()
+    limits = []
+    if os.path.exists(os.path.join(_CGROUP_ROOT, "cgroup.controllers")):
+        for cgroup_dir in _ancestors(_CGROUP_ROOT, cgroups.get("", "/")):
+            cpu_max = _read(os.path.join(cgroup_dir, "cpu.max"))
+            if cpu_max:
+                quota, _, period = cpu_max.partition(" ")
+                if quota != "max" and period:
+                    limits.append(int(quota) / int(period))
+        return min(limits, default=None)
+
+    for v1_root in _CGROUP_V1_DIRS:
+        for cgroup_dir in _ancestors(v1_root, cgroups.get("cpu", "/")):
+            quota = _read(os.path.join(cgroup_dir, "cpu.cfs_quota_us"))
+            period = _read(os.path.join(cgroup_dir, "cpu.cfs_period_us"))
+            if quota and period and int(quota) > 0:
+                limits.append(int(quota) / int(period))
+        if limits:
+            break
+    return min(limits, default=None)
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process can actually use: the affinity mask, capped by the
+    cgroup quota (rounded down, at least 1). COMPUTE_CPUS overrides both.
+    """
+    override = os.environ.get("COMPUTE_CPUS")
+    if override:
+        return max(1, int(override))
+
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, int(limit))
+    return max(1, cpus)
+
+
+def plan_thread_budget(cpus: Optional[int] = None,
+                       job_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Split cpus between concurrent jobs and, within a job, between the video
+    and audio stages. Returns {cpus, job_workers, per_job, video, audio,
+    opencv, interop}.
+    """
+    cpus = cpus or available_cpus()
+    if job_workers is None:
+        env_workers = os.environ.get("JOB_WORKERS")
+        if env_workers:
+            job_workers = int(env_workers)
+        else:
+            job_workers = min(MAX_AUTO_JOB_WORKERS, max(1, cpus // CPUS_PER_JOB))
+    job_workers = max(1, job_workers)
+
+    per_job = max(1, cpus // job_workers)
+    audio_share = float(os.environ.get("AUDIO_STAGE_SHARE", "0.25"))
+    audio = max(1, round(per_job * audio_share))
+    video = max(1, per_job - audio)
+
+    return {
+        "cpus": cpus,
+        "job_workers": job_workers,
+        "per_job": per_job,
+        "video": video,
+        "audio": audio,
+        "opencv": int(os.environ.get("OPENCV_THREADS", video)),
+        "interop": int(os.environ.get("TORCH_INTEROP_THREADS", "1")),
+    }
+
+
+def configure_process(budget: Dict[str, int]) -> None:
+    """
+    Apply the process-wide settings. Call once at startup, before any model
+    runs: torch refuses to resize the inter-op pool after it has been used.
+    """
+    try:
+        torch.set_num_interop_threads(budget["interop"])
+    except RuntimeError as e:
+        print(f"[WARNING] Could not set torch inter-op threads: {e}")
+    cv2.setNumThreads(budget["opencv"])
+    # Main thread (model warm start, direct endpoint calls) runs as one job
+    torch.set_num_threads(budget["per_job"])
+    print(
+        f"[compute] {budget['cpus']} CPUs: {budget['job_workers']} job workers x "
+        f"{budget['per_job']} threads (video {budget['video']}, audio {budget['audio']}), "
+        f"OpenCV {budget['opencv']}, inter-op {budget['interop']}"
+    )
+
+
+def apply_thread_budget(threads: Optional[int]) -> None:
+    """
+    Size the calling thread's torch intra-op pool (no-op for None).
+    """
+    if threads:
+        # get_num_threads() runs this thread's lazy OpenMP init now, so the
+        # count set below can't be overwritten by another thread's later call
+        torch.get_num_threads()
+        torch.set_num_threads(threads)
@@ -0,0 +1,120 @@
+"""
+Frame preprocessing for the video models.
+
+Every sampled frame is downscaled once, right after decode, to a small RGB
+"base" image. Each model's input is derived from the base: YOLO takes it as
+is, BLIP gets a 384x384 resize and VideoMAE a 224 shortest-edge resize plus
+center crop. Model inputs are normalized into reusable torch buffers, so the
+HF processors never resize again and there are no PIL round trips. Only
+small per-model arrays outlive a frame. The full-resolution decode buffer
+(see DataFromVideo._sample_frames) is overwritten by the next frame.
+
+Sizes match the checkpoints in DataFromVideo (yolov5s letterboxes to 640,
+BLIP base uses 384x384, VideoMAE base uses 224).
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+YOLO_INPUT_SIZE = 640  # longest edge YOLO letterboxes to
+BLIP_IMAGE_SIZE = 384
+VIDEOMAE_SHORT_EDGE = 224
+VIDEOMAE_CROP_SIZE = 224
+SIGNATURE_SIZE = 32
+
+
+class FramePreprocessor:
+    def __init__(self,
+                 yolo_size: int = YOLO_INPUT_SIZE,
+                 blip_size: int = BLIP_IMAGE_SIZE,
+                 clip_short_edge: int = VIDEOMAE_SHORT_EDGE,
+                 clip_crop: int = VIDEOMAE_CROP_SIZE):
+        self.yolo_size = yolo_size
+        self.blip_size = blip_size
+        self.clip_short_edge = clip_short_edge
+        self.clip_crop = clip_crop
+        self._u8: Dict[Tuple[int, ...], np.ndarray] = {}
+        self._f32: Dict[Tuple[int, ...], torch.Tensor] = {}
+
+    def base(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Full-resolution BGR frame -> smallest RGB image every model can be
+        derived from without upscaling: longest edge >= yolo_size and
+        shortest edge >= max(blip_size, clip_short_edge). Never aliases frame.
+        """
+        h, w = frame.shape[:2]
+        min_short = max(self.blip_size, self.clip_short_edge)
+        scale = min(1.0, max(self.yolo_size / max(h, w), min_short / min(h, w)))
+        if scale < 1.0:
+            small = cv2.resize(
+                frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA
+            )
+            return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def for_blip(self, base: np.ndarray) -> np.ndarray:
+        return cv2.resize(
+            base, (self.blip_size, self.blip_size), interpolation=cv2.INTER_AREA
+        )
+
+    def for_clip(self, base: np.ndarray) -> np.ndarray:
+        h, w = base.shape[:2]
+        scale = self.clip_short_edge / min(h, w)
+        rh, rw = max(self.clip_crop, round(h * scale)), max(self.clip_crop, round(w * scale))
+        resized = cv2.resize(base, (rw, rh), interpolation=cv2.INTER_AREA)
+        top, left = (rh - self.clip_crop) // 2, (rw - self.clip_crop) // 2
+        # Copy so the crop doesn't keep the whole resized image alive
+        return resized[top : top + self.clip_crop, left : left + self.clip_crop].copy()
+
+    def signature(self, image: np.ndarray) -> np.ndarray:
+        # Tiny grayscale thumbnail used to spot near-identical frames
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(
+            gray, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA
+        ).astype(np.float32)
+
+    def pixel_values(self,
+                     images: Sequence,
+                     mean: Sequence[float],
+                     std: Sequence[float]) -> torch.Tensor:
+        """
+        Stack same-sized HxWx3 uint8 RGB images (or lists of them, for clips)
+        into a normalized float tensor of shape (..., 3, H, W), the layout the
+        HF models take as pixel_values.
+
+        The result lives in a buffer reused by the next call with the same
+        shape, so consume it (forward/generate) before calling again.
+        """
+        if isinstance(images[0], (list, tuple)):
+            shape = (len(images), len(images[0])) + images[0][0].shape
+            u8 = self._buffer_u8(shape)
+            for i, clip in enumerate(images):
+                np.stack(clip, out=u8[i])
+        else:
+            shape = (len(images),) + images[0].shape
+            u8 = self._buffer_u8(shape)
+            np.stack(images, out=u8)
+
+        channels_first = torch.from_numpy(u8).movedim(-1, -3)
+        out = self._buffer_f32(tuple(channels_first.shape))
+        out.copy_(channels_first)
+        view = (1,) * (out.dim() - 3) + (3, 1, 1)
+        out.mul_(1.0 / 255.0)
+        out.sub_(torch.tensor(mean, dtype=out.dtype).view(view))
+        out.div_(torch.tensor(std, dtype=out.dtype).view(view))
+        return out
+
+    def _buffer_u8(self, shape: Tuple[int, ...]) -> np.ndarray:
+        buf = self._u8.get(shape)
+        if buf is None:
+            buf = self._u8[shape] = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def _buffer_f32(self, shape: Tuple[int, ...]) -> torch.Tensor:
+        buf = self._f32.get(shape)
+        if buf is None:
+            buf = self._f32[shape] = torch.empty(shape, dtype=torch.float32)
+        return buf
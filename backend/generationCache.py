@@ -0,0 +1,106 @@
+"""
+In-memory memoization for the prompt (LLM) and music generation steps.
+
+Both steps are slow, paid network round trips whose output only depends on
+their text inputs, so results are cached under a hash of the normalized
+inputs with a TTL and LRU eviction. Normalization makes near-identical
+analyses share an entry: whitespace is collapsed, ISO timestamps (e.g. the
+per-segment analysis time in the audio results) are dropped and floats are
+rounded to PROMPT_FLOAT_DIGITS.
+
+Config (env):
+  PROMPT_CACHE_TTL   seconds a GPT answer stays valid (default 3600)
+  PROMPT_CACHE_SIZE  max cached GPT answers (default 256)
+  TRACK_CACHE_TTL    seconds a generated track stays valid (default 86400)
+  TRACK_CACHE_SIZE   max cached tracks (default 128)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+PROMPT_FLOAT_DIGITS = 2
+
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?")
+_FLOAT_RE = re.compile(r"-?\d+\.\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str, digits: int = PROMPT_FLOAT_DIGITS) -> str:
+    """
+    Canonical form of a prompt input for cache keys.
+    """
+    text = _TIMESTAMP_RE.sub("<ts>", text or "")
+    text = _FLOAT_RE.sub(lambda m: f"{float(m.group()):.{digits}f}", text)
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+
+def make_key(*parts: Optional[str]) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(normalize_text(part or "").encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after insertion.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+prompt_cache = TTLCache(
+    max_size=int(os.environ.get("PROMPT_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("PROMPT_CACHE_TTL", "3600")),
+)
+track_cache = TTLCache(
+    max_size=int(os.environ.get("TRACK_CACHE_SIZE", "128")),
+    ttl=float(os.environ.get("TRACK_CACHE_TTL", "86400")),
+)
@@ -0,0 +1,318 @@
+"""
+Selectable CPU inference backends for the analysis models.
+
+The model loaders (DataFromVideo, audioAnalysis) pass each freshly loaded
+fp32 model through optimize_model(), which applies the configured backend:
+
+  eager    default fp32 PyTorch (no change)
+  int8     dynamic int8 quantization of the nn.Linear layers
+  compile  torch.compile on the model's heavy sub-network
+  onnx     ONNX Runtime, exported once to ONNX_CACHE_DIR (VideoMAE only)
+
+Not every model supports every backend. YOLO is convolutional, so dynamic
+Linear quantization does nothing for it. BLIP's generate loop and CLAP's
+dual encoders do not export as one graph. Unsupported choices fall back to
+the nearest supported backend, and the fallback is logged.
+
+Config (env):
+  INFERENCE_BACKEND         backend for every model (default eager)
+  INFERENCE_BACKEND_<NAME>  per-model override, e.g. INFERENCE_BACKEND_YOLO=compile
+  ONNX_CACHE_DIR            exported ONNX models (default test/cache/onnx)
+
+Parity check against fp32 on a bundled clip:
+  python inferenceBackend.py test/videos/output_video.mp4 int8
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import torch
+
+from computeBudget import plan_thread_budget
+
+BACKENDS = ("eager", "int8", "compile", "onnx")
+
+# Backends each model can actually use, best first for fallback
+SUPPORTED_BACKENDS = {
+    "yolo": ("eager", "compile"),
+    "blip": ("eager", "int8", "compile"),
+    "videomae": ("eager", "int8", "compile", "onnx"),
+    "clap": ("eager", "int8", "compile"),
+}
+FALLBACKS = {"onnx": "int8", "int8": "eager", "compile": "eager"}
+
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", os.path.join("test", "cache", "onnx"))
+ONNX_OPSET = 17
+
+# Minimum agreement with fp32 for the parity check to pass
+PARITY_MIN_AGREEMENT = 0.9
+
+
+def inference_backend(name: str) -> str:
+    """
+    Configured backend for model name, after falling back to one it supports.
+    """
+    requested = (
+        os.environ.get(f"INFERENCE_BACKEND_{name.upper()}")
+        or os.environ.get("INFERENCE_BACKEND", "eager")
+    ).lower()
+    if requested not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{requested}' (choose from {BACKENDS})")
+
+    backend = requested
+    supported = SUPPORTED_BACKENDS.get(name, ("eager",))
+    # int8/onnx are CPU-only paths; on GPU keep the fp32 model
+    if torch.cuda.is_available() and backend in ("int8", "onnx"):
+        backend = "eager"
+    while backend not in supported:
+        backend = FALLBACKS[backend]
+    if backend != requested:
+        print(f"[models] {name}: backend '{requested}' not supported, using '{backend}'")
+    return backend
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    return torch.ao.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def compile_module(module: torch.nn.Module) -> torch.nn.Module:
+    if not hasattr(torch, "compile"):
+        print("[WARNING] torch.compile needs PyTorch 2.x; running eager")
+        return module
+    return torch.compile(module)
+
+
+class OnnxVideoClassifier:
+    """
+    ONNX Runtime stand-in for VideoMAEForVideoClassification: called with
+    pixel_values, returns an object with .logits; keeps the HF config for
+    id2label.
+    """
+
+    def __init__(self, onnx_path: str, config, threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        # ORT keeps its own pool and ignores torch's thread settings
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.config = config
+
+    def __call__(self, pixel_values: torch.Tensor):
+        (logits,) = self.session.run(
+            ["logits"], {"pixel_values": pixel_values.detach().cpu().numpy()}
+        )
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+class _LogitsOnly(torch.nn.Module):
+    # Export wrapper: HF models return ModelOutput objects, ONNX wants tensors
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def onnx_video_classifier(model, model_id: str, num_frames: int = 16,
+                          size: int = 224) -> OnnxVideoClassifier:
+    """
+    Export model to ONNX_CACHE_DIR on first use (dynamic batch axis) and
+    load it with ONNX Runtime, sized to the video stage's thread budget.
+    """
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    onnx_path = os.path.join(
+        ONNX_CACHE_DIR, f"{model_id.replace('/', '--')}-{num_frames}x{size}.onnx"
+    )
+    if not os.path.exists(onnx_path):
+        t0 = time.time()
+        dummy = torch.zeros(1, num_frames, 3, size, size)
+        with torch.no_grad():
+            torch.onnx.export(
+                _LogitsOnly(model).eval(),
+                (dummy,),
+                onnx_path + ".part",
+                input_names=["pixel_values"],
+                output_names=["logits"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=ONNX_OPSET,
+            )
+        os.replace(onnx_path + ".part", onnx_path)
+        print(f"[models] Exported {model_id} to {onnx_path} in {time.time() - t0:.1f}s")
+    return OnnxVideoClassifier(onnx_path, model.config, plan_thread_budget()["video"])
+
+
+def optimize_model(name: str, model, model_id: Optional[str] = None):
+    """
+    Apply the configured backend to a loaded fp32 model (see module docs).
+    Returns the model to use in its place.
+    """
+    backend = inference_backend(name)
+    if backend == "eager":
+        return model
+
+    t0 = time.time()
+    if name == "yolo":
+        # AutoShape keeps pre/post-processing in Python; compile the network
+        model.model = compile_module(model.model)
+    elif name == "blip":
+        if backend == "int8":
+            model = quantize_int8(model)
+        else:
+            # Autoregressive text decoding recompiles per length; compile the
+            # vision encoder, which dominates per-frame cost
+            model.vision_model = compile_module(model.vision_model)
+    elif name == "videomae":
+        if backend == "int8":
+            model = quantize_int8(model)
+        elif backend == "compile":
+            model = compile_module(model)
+        else:
+            model = onnx_video_classifier(model, model_id or name)
+    elif name == "clap":
+        if backend == "int8":
+            model = quantize_int8(model)
+        else:
+            model.audio_model = compile_module(model.audio_model)
+    print(f"[models] {name}: {backend} backend ready in {time.time() - t0:.1f}s")
+    return model
+
+
+def _backend_env_vars() -> List[str]:
+    # Every variable inference_backend() reads
+    return ["INFERENCE_BACKEND"] + [
+        f"INFERENCE_BACKEND_{name.upper()}" for name in SUPPORTED_BACKENDS
+    ]
+
+
+def _run_analysis(video_path: str, backend: str, step: int, chunk_seconds: int) -> Dict:
+    # Imported here: both modules import this one for their loaders
+    import audioAnalysis
+    from DataFromVideo import DataFromVideo, VIDEO_MODELS
+    from modelRegistry import unload_models, warm_start
+
+    # Per-model overrides would otherwise win over the backend under test
+    for var in _backend_env_vars():
+        os.environ.pop(var, None)
+    os.environ["INFERENCE_BACKEND"] = backend
+    unload_models(VIDEO_MODELS + ["clap"])
+    audioAnalysis._TEXT_EMBEDDINGS.clear()
+    warm_start(VIDEO_MODELS + ["clap"])
+
+    def analyze():
+        result_list, detail_list, timeline = DataFromVideo().analyze_all(
+            video_path, step=step, chunk_seconds=chunk_seconds, save_csv=False
+        )
+        audio = audioAnalysis.extract_audio_16k_mono(video_path)
+        audio_results = audioAnalysis.analyze_audio_segments(audio) if audio is not None else []
+        return {
+            "objects": result_list,
+            "captions": detail_list,
+            "timeline": timeline,
+            "audio": audio_results,
+        }
+
+    # Untimed warm-up pass: torch.compile traces and CLAP text embeddings
+    # happen on first use, so only the second pass measures steady state
+    analyze()
+    t0 = time.time()
+    result = analyze()
+    result["seconds"] = time.time() - t0
+    return result
+
+
+def _agreement(ref: List, test: List) -> float:
+    if not ref and not test:
+        return 1.0
+    matches = sum(a == b for a, b in zip(ref, test))
+    return matches / max(len(ref), len(test))
+
+
+def compare_outputs(ref: Dict, test: Dict) -> Dict[str, float]:
+    """
+    Agreement of a backend's analysis with the fp32 reference, per model.
+    """
+    ref_counts = Counter(r["class"] for r in ref["objects"])
+    test_counts = Counter(r["class"] for r in test["objects"])
+    union = sum((ref_counts | test_counts).values())
+    yolo = sum((ref_counts & test_counts).values()) / union if union else 1.0
+
+    conf_diffs = [
+        abs(a["confidence"] - b["confidence"])
+        for a, b in zip(ref["timeline"], test["timeline"])
+    ]
+    mood_diffs = [
+        abs(a["confidence"] - b["confidence"]) for a, b in zip(ref["audio"], test["audio"])
+    ]
+    return {
+        "yolo_class_overlap": yolo,
+        "blip_caption_match": _agreement(
+            [r["caption"] for r in ref["captions"]], [r["caption"] for r in test["captions"]]
+        ),
+        "videomae_label_match": _agreement(
+            [r["scene_label"] for r in ref["timeline"]],
+            [r["scene_label"] for r in test["timeline"]],
+        ),
+        "videomae_max_conf_diff": max(conf_diffs, default=0.0),
+        "clap_mood_match": _agreement(
+            [r["top_mood"] for r in ref["audio"]], [r["top_mood"] for r in test["audio"]]
+        ),
+        "clap_max_conf_diff": max(mood_diffs, default=0.0),
+        "speedup": ref["seconds"] / test["seconds"] if test["seconds"] else 0.0,
+    }
+
+
+def parity_check(video_path: str, backend: str, step: int = 120,
+                 chunk_seconds: int = 5) -> bool:
+    """
+    Run the full analysis with fp32 and with backend on video_path and
+    print per-model agreement. Each run loads its models and does one
+    untimed warm-up pass, so speedup compares steady-state inference.
+    Returns True when every agreement score is at least
+    PARITY_MIN_AGREEMENT.
+    """
+    previous = {var: os.environ.get(var) for var in _backend_env_vars()}
+    try:
+        ref = _run_analysis(video_path, "eager", step, chunk_seconds)
+        test = _run_analysis(video_path, backend, step, chunk_seconds)
+    finally:
+        for var, value in previous.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    report = compare_outputs(ref, test)
+    print(f"\nParity: {backend} vs eager fp32 on {video_path}")
+    for metric, value in report.items():
+        print(f"  {metric:24s} {value:.3f}")
+
+    passed = all(
+        value >= PARITY_MIN_AGREEMENT
+        for metric, value in report.items()
+        if metric.endswith(("_overlap", "_match"))
+    )
+    print("  PASS" if passed else "  FAIL")
+    return passed
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python inferenceBackend.py /path/to/video.mp4 <int8|compile|onnx>")
+        sys.exit(1)
+    sys.exit(0 if parity_check(sys.argv[1], sys.argv[2]) else 1)
+
+
+if __name__ == "__main__":
+    main()
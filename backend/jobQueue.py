@@ -0,0 +1,167 @@
+"""
+In-process background job queue for the generation pipeline.
+
+Endpoints submit work and return a job id immediately; a pool of worker
+threads runs the (blocking) torch / Suno / MoviePy pipeline off the event
+loop. Job records follow the generation schema in the README:
+
+  status:   "queued" | "processing" | "audio_ready" | "complete" | "error"
+  progress: 0.0 - 1.0
+  stage:    current pipeline stage (used to tag errors)
+  errors:   [ { stage, message, ts } ]
+  result:   whatever the job function returned, once complete
+
+Besides the record, each job has an append-only event log for streaming
+partial results: update(event={...}) appends to it (instead of storing the
+field), status changes are logged too, and events(job_id, since) returns
+everything after a cursor. Each event carries its sequence number "seq".
+
+Finished jobs ("complete" / "error") are kept for JOB_TTL_SEC after their
+last update, then dropped with their event log; the optional on_evict
+callback gets the dropped record so callers can delete the job's files.
+Expired jobs are pruned whenever jobs are submitted or looked up.
+
+Config (env):
+  JOB_TTL_SEC  seconds a finished job stays queryable (default 3600)
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+JOB_STATUSES = ("queued", "processing", "audio_ready", "complete", "error")
+FINAL_STATUSES = ("complete", "error")
+
+JOB_TTL_SEC = float(os.environ.get("JOB_TTL_SEC", "3600"))
+
+
+class JobQueue:
+    def __init__(self, max_workers: int = 2,
+                 initializer: Optional[Callable[..., Any]] = None,
+                 initargs: tuple = (),
+                 ttl: float = JOB_TTL_SEC,
+                 on_evict: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        # initializer runs once in each worker thread (e.g. thread budgets)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="job",
+                                        initializer=initializer,
+                                        initargs=initargs)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.on_evict = on_evict
+
+    def submit(self, fn: Callable[..., Any], *args,
+               job_id: Optional[str] = None, **kwargs) -> str:
+        """
+        Queue fn(*args, update=<callback>, **kwargs) and return its job id.
+        fn reports progress by calling update(status=..., stage=..., progress=...).
+        """
+        self.prune()
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "stage": None,
+                "progress": 0.0,
+                "createdAt": now,
+                "updatedAt": now,
+                "result": None,
+                "errors": [],
+            }
+            self._events[job_id] = []
+        self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        status = fields.get("status")
+        if status is not None and status not in JOB_STATUSES:
+            raise ValueError(f"Unknown job status: {status}")
+        event = fields.pop("event", None)
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updatedAt"] = time.time()
+            if event is not None:
+                self._append_event(job_id, event)
+            if status is not None:
+                self._append_event(
+                    job_id,
+                    {"type": "status", "status": status, "progress": job["progress"]},
+                )
+
+    def _append_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        # Caller holds self._lock
+        log = self._events[job_id]
+        log.append(dict(event, seq=len(log), ts=time.time()))
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        """
+        Events of job_id with seq >= since (non-blocking; poll to stream).
+        Empty once the job has been evicted.
+        """
+        with self._lock:
+            return list(self._events.get(job_id, [])[since:])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self.prune()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        self.prune()
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+    def prune(self) -> List[str]:
+        """
+        Drop finished jobs whose last update is older than ttl, with their
+        event logs, and pass each dropped record to on_evict. Returns the
+        evicted job ids.
+        """
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINAL_STATUSES and job["updatedAt"] < cutoff
+            ]
+            evicted = [self._jobs.pop(job_id) for job_id in expired]
+            for job_id in expired:
+                self._events.pop(job_id, None)
+        # Outside the lock: cleanup may touch the filesystem
+        for job in evicted:
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(job)
+                except Exception as e:
+                    print(f"[WARNING] Cleanup of job {job['id']} failed: {e}")
+        return expired
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job_id: str, fn, args, kwargs) -> None:
+        self.update(job_id, status="processing")
+
+        def update(**fields):
+            self.update(job_id, **fields)
+
+        try:
+            result = fn(*args, update=update, **kwargs)
+            self.update(job_id, status="complete", progress=1.0, result=result)
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["errors"].append(
+                    {"stage": job.get("stage"), "message": str(e), "ts": time.time()}
+                )
+            self.update(job_id, status="error")
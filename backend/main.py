@@ -1,54 +1,157 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+import asyncio
+import json
 import uuid
 import os
+import shutil
 import pandas as pd
 from dotenv import load_dotenv
-from SunoMusicGenerator import SunoMusicGenerator
-from DataFromVideo import DataFromVideo
+from SunoMusicGenerator import create_music_generator
 from VideoToMusic import prompt_gpt, merge_music_and_video
-from audioAnalysis import analyze_audio_segments, save_sentiment_data, extract_audio_16k_mono_to_temp
-import time
+from analysisPipeline import run_analysis_stages, parse_cpu_list, video_stage
+from modelRegistry import warm_start, loaded_models
+from jobQueue import JobQueue, FINAL_STATUSES
+from computeBudget import plan_thread_budget, configure_process, apply_thread_budget
+from analysisSummary import summarize_analysis, format_summary
+from analysisStore import AnalysisStore, ANALYSIS_DIR
+import glob
 import tempfile
 
 app = FastAPI()
 
+UPLOAD_DIR = os.path.join("test", "uploads")
+OUTPUT_DIR = os.path.join("test", "outputs")
+
+# CPU split between concurrent jobs and their analysis stages (computeBudget.py).
+# Planned at import because the job pool is sized from it, so load
+# .env.local first for COMPUTE_CPUS / JOB_WORKERS / ... to take effect.
+load_dotenv(".env.local")
+budget = plan_thread_budget()
+
+
+def _remove_job_files(job):
+    # Called when a finished job expires (JOB_TTL_SEC): drop its upload,
+    # rendered output and analysis store
+    job_id = job["id"]
+    for path in glob.glob(os.path.join(UPLOAD_DIR, f"{job_id}.*")) + glob.glob(
+        os.path.join(OUTPUT_DIR, f"{job_id}.*")
+    ):
+        os.remove(path)
+    shutil.rmtree(os.path.join(ANALYSIS_DIR, job_id), ignore_errors=True)
+
+
+# Background workers for submitted jobs (see /jobs/ endpoints); each worker
+# thread gets one job's share of torch threads
+jobs = JobQueue(
+    max_workers=budget["job_workers"],
+    initializer=apply_thread_budget,
+    initargs=(budget["per_job"],),
+    on_evict=_remove_job_files,
+)
+
+# Server-sent events: event log poll interval and keep-alive period
+SSE_POLL_SEC = 0.5
+SSE_KEEPALIVE_SEC = 15.0
+
+
+def _noop_update(**fields):
+    pass
+
+
+@app.on_event("startup")
+def load_models():
+    # Set WARM_START_MODELS=0 to load models lazily on the first request instead
+    load_dotenv(".env.local")
+    configure_process(budget)
+    if os.environ.get("WARM_START_MODELS", "1") == "1":
+        warm_start()
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    jobs.shutdown(wait=False)
+
 
 @app.get("/")
 def root():
-    return {"message": "Welcome to the NoSu API!"}
+    return {
+        "message": "Welcome to the NoSu API!",
+        "models_loaded": loaded_models(),
+        "compute": budget,
+    }
 
 
-@app.post("/video-to-music/")
-async def video_to_music():
+def _analysis_events(update, start=0.05, end=0.5):
+    # Publish partial analysis results on the job's event log; the video
+    # stage (the long one) drives job progress between start and end
+    def on_event(event):
+        fields = {"event": event}
+        if event["stage"] == "video":
+            fields["progress"] = round(start + (end - start) * event["progress"], 3)
+        update(**fields)
+    return on_event
+
+
+def _adaptive_sampling():
+    # ADAPTIVE_SAMPLING=0 goes back to the fixed step/chunk grid
+    return os.environ.get("ADAPTIVE_SAMPLING", "1") == "1"
+
+
+def _video_sampling():
+    # Time-based YOLO/BLIP sampling and the frame skip mode for the video stage
+    return {
+        "sample_fps": float(os.environ.get("VIDEO_SAMPLE_FPS", "0.25")) or None,
+        "sampling": os.environ.get("VIDEO_SAMPLING", "seek"),
+    }
+
+
+def _job_store(store_dir):
+    # Every run gets its own analysis directory so parallel jobs never collide
+    return AnalysisStore(store_dir or os.path.join(ANALYSIS_DIR, str(uuid.uuid4())))
+
+
+def run_video_to_music(video_path, store_dir=None, regenerate=False, update=_noop_update):
     instructions = """
 You are a coding assistant that converts scene descriptions into short prompts for SUNO AI background music generation.
 Keep responses concise (1 sentences per scene, under 50 characters).
 Focus only on mood, genre, and instrumentation. Avoid long explanations.
 Output only the music prompt text, nothing else.
 """
-    video_path = "/home/bkhwaja/hackathons/Mit_Hacks/backend/test/videos/sekiro.mp4"
-    meta_data = DataFromVideo()
-    result_list = meta_data.analyze_video(video_path, step=120)
-    detail_list = meta_data.detail_analyze_video(video_path, step=120)
-    timeline = meta_data.scene_understanding_timeline(video_path, chunk_seconds=5)
-    user_input = (
-        f"objects={result_list}, scene labels={detail_list}, action labels={timeline}"
+    update(stage="video_analysis", progress=0.05)
+    store = _job_store(store_dir)
+    result_list, detail_list, timeline = video_stage(
+        video_path, step=120, chunk_seconds=5, store=store,
+        adaptive=_adaptive_sampling(), on_event=_analysis_events(update),
+        **_video_sampling(),
     )
+    summary = summarize_analysis(result_list, detail_list, timeline)
+    user_input = format_summary(summary)
     # Initialize client
+    update(stage="prompt", progress=0.5)
     load_dotenv(".env.local")
     key = os.environ.get("GPT_KEY")
-    answer = prompt_gpt(instructions, user_input, key)
+    # regenerate=True skips the prompt/track caches for a fresh track
+    answer = prompt_gpt(instructions, user_input, key, use_cache=not regenerate)
     print(answer)
     video_prompt = answer
     tags = "background"
-    suno = SunoMusicGenerator()
-    suno.prompt_suno(video_prompt, tags)
-    return {"message": "Success on creating the audio file."}
+    update(stage="music_generation", progress=0.6)
+    suno = create_music_generator()
+    track = suno.generate_track(video_prompt, tags, use_cache=not regenerate)
+    update(status="audio_ready", progress=0.95)
+    return {
+        "message": "Success on creating the audio file.",
+        "clip_id": track["id"],
+        "audio_path": track["local_path"],
+        "summary": summary,
+        "analysis_store": store.path,
+    }
 
 
-@app.post("/video-to-video/")
-async def video_to_video():
+def run_video_to_video(video_path, output_path="output_video.mp4", store_dir=None,
+                       regenerate=False, update=_noop_update):
     instructions = """
 You are a coding assistant that converts scene descriptions and audio mood analysis into short prompts for SUNO AI background music generation.
 
@@ -63,59 +166,48 @@ Keep responses concise (1-2 sentences per scene, under 200 characters).
 Focus only on mood, genre, and instrumentation. Avoid long explanations.
 Output only the music prompt text, nothing else.
 """
-    video_path = 'test/videos/beach_audio.mp4'
-    
     print("=" * 60)
     print("STARTING INTEGRATED VIDEO + AUDIO ANALYSIS")
     print("=" * 60)
     
-    # 1. Video Analysis (Image Processing)
-    print("\n1. Running Video Analysis...")
-    meta_data = DataFromVideo()
-    result_list = meta_data.analyze_video(video_path, step=120)
-    detail_list = meta_data.detail_analyze_video(video_path, step=120)
-    timeline = meta_data.scene_understanding_timeline(video_path, chunk_seconds=5)
-    print(f"   ✓ Video analysis complete: {len(result_list)} objects, {len(detail_list)} scenes, {len(timeline)} timeline chunks")
-    
-    # 2. Audio Analysis (Mood Detection)
-    print("\n2. Running Audio Analysis...")
-    audio_results = None
-    audio_csv_path = None
-    tmp_audio = None
+    update(stage="analysis", progress=0.05)
+    store = _job_store(store_dir)
+    # MIX_ORIGINAL_AUDIO=1 keeps the source audio and ducks the music under speech
+    mix = os.environ.get("MIX_ORIGINAL_AUDIO", "0") == "1"
     
-    try:
-        # Extract audio from video
-        tmp_audio = extract_audio_16k_mono_to_temp(video_path)
-        print(f"   ✓ Audio extracted to: {tmp_audio}")
-        
-        # Analyze audio segments
-        audio_results = analyze_audio_segments(tmp_audio, num_segments=4)
-        print(f"   ✓ Audio analysis complete: {len(audio_results)} segments analyzed")
-        
-        # Save audio analysis to CSV
-        audio_csv_path = save_sentiment_data(audio_results, video_path)
-        print(f"   ✓ Audio CSV saved to: {audio_csv_path}")
-        
-    except Exception as e:
-        print(f"   ✗ Audio analysis failed: {e}")
-        audio_results = []
+    # 1 + 2. Video Analysis (Image Processing) and Audio Analysis (Mood
+    # Detection) share no data, so they run concurrently
+    (result_list, detail_list, timeline), (audio_results, audio_csv_path, speech_windows) = (
+        run_analysis_stages(
+            video_path,
+            step=120,
+            chunk_seconds=5,
+            num_segments=4,
+            speech=mix,
+            max_workers=int(os.environ.get("ANALYSIS_WORKERS", "2")),
+            affinity={
+                "video": parse_cpu_list(os.environ.get("VIDEO_STAGE_CPUS")),
+                "audio": parse_cpu_list(os.environ.get("AUDIO_STAGE_CPUS")),
+            },
+            store=store,
+            adaptive=_adaptive_sampling(),
+            on_event=_analysis_events(update),
+            threads={"video": budget["video"], "audio": budget["audio"]},
+            **_video_sampling(),
+        )
+    )
     
     # 3. Prepare Combined Data for GPT
     print("\n3. Preparing Combined Analysis Data...")
     
+    # Bounded summary instead of the raw lists, so the prompt size does not
+    # grow with video length
+    summary = summarize_analysis(result_list, detail_list, timeline, audio_results)
     user_input = f"""
-VIDEO ANALYSIS DATA:
-- Objects detected: {result_list}
-- Scene descriptions: {detail_list}  
-- Action/scene timeline with confidence: {timeline}
-
-AUDIO ANALYSIS DATA:
+ANALYSIS SUMMARY:
+{format_summary(summary)}
 """
-    
-    if audio_results:
-        user_input += f"- Audio mood analysis: {audio_results}"
-    else:
-        user_input += "- Audio mood analysis: Not available"
+    print(f"   ✓ Prompt payload: {len(user_input)} chars")
     
     user_input += """
 
@@ -129,41 +221,36 @@ CONFIDENCE WEIGHTING INSTRUCTIONS:
     
     # 4. Generate Music Prompt with GPT
     print("\n4. Generating Music Prompt with GPT...")
+    update(stage="prompt", progress=0.5)
     load_dotenv(".env.local")
     key = os.environ.get("GPT_KEY")
-    answer = prompt_gpt(instructions, user_input, key)
+    # regenerate=True skips the prompt/track caches for a fresh track
+    answer = prompt_gpt(instructions, user_input, key, use_cache=not regenerate)
     print(f"   ✓ GPT Response: {answer}")
     
     # 5. Generate Music with Suno
     print("\n5. Generating Music with Suno...")
+    update(stage="music_generation", progress=0.6)
     video_prompt = answer
     tags = "background"
-    suno = SunoMusicGenerator()
-    clip_id = suno.prompt_suno(video_prompt, tags)
-    audio_path = f"test/downloads/{clip_id}.mp3"
+    suno = create_music_generator()
+    # The downloaded track comes straight back from the generator
+    track = suno.generate_track(video_prompt, tags, use_cache=not regenerate)
+    clip_id = track["id"]
+    audio_path = track["local_path"]
     
-    # 6. Wait for audio and merge with video
+    # 6. Merge with video
     print("\n6. Merging Music with Video...")
-    timeout = 60
-    waited = 0
-    while not os.path.exists(audio_path) and waited < timeout:
-        print(f"   Waiting for audio file {audio_path} to be created...")
-        time.sleep(2)
-        waited += 2
-
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"Audio file not found after waiting: {audio_path}")
-    
-    merge_music_and_video(video_path, audio_path)
+    update(status="audio_ready", stage="merge", progress=0.8)
+    merge_music_and_video(
+        video_path,
+        audio_path,
+        output_path=output_path,
+        mix=mix,
+        speech_windows=speech_windows,
+    )
     print("   ✓ Video with music created successfully!")
     
-    # Cleanup
-    if tmp_audio and os.path.exists(tmp_audio):
-        try:
-            os.remove(tmp_audio)
-        except:
-            pass
-    
     print("\n" + "=" * 60)
     print("ANALYSIS COMPLETE!")
     print("=" * 60)
@@ -177,7 +264,160 @@ CONFIDENCE WEIGHTING INSTRUCTIONS:
         },
         "audio_analysis": {
             "segments": len(audio_results) if audio_results else 0,
-            "csv_path": audio_csv_path
+            "path": audio_csv_path
         },
-        "gpt_prompt": answer
-    }
\ No newline at end of file
+        "analysis_store": store.path,
+        "summary": summary,
+        "gpt_prompt": answer,
+        "clip_id": clip_id,
+        "audio_path": audio_path,
+        "output_path": output_path,
+    }
+
+
+async def _run_without_job(fn, video_path):
+    # Blocking inference runs on a worker thread, not the event loop. There is
+    # no job id to read the analysis store back by, so it is removed afterwards
+    store_dir = os.path.join(ANALYSIS_DIR, str(uuid.uuid4()))
+    try:
+        result = await run_in_threadpool(fn, video_path, store_dir=store_dir)
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    result.pop("analysis_store", None)
+    return result
+
+
+@app.post("/video-to-music/")
+async def video_to_music():
+    video_path = "/home/bkhwaja/hackathons/Mit_Hacks/backend/test/videos/sekiro.mp4"
+    return await _run_without_job(run_video_to_music, video_path)
+
+
+@app.post("/video-to-video/")
+async def video_to_video():
+    video_path = 'test/videos/beach_audio.mp4'
+    return await _run_without_job(run_video_to_video, video_path)
+
+
+def _save_upload(job_id, file):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    ext = os.path.splitext(file.filename or "")[1] or ".mp4"
+    video_path = os.path.join(UPLOAD_DIR, f"{job_id}{ext}")
+    with open(video_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    return video_path
+
+
+@app.post("/jobs/video-to-video/")
+def submit_video_to_video(file: UploadFile = File(...), regenerate: bool = False):
+    """
+    Queue a video -> video job and return its id right away.
+    Poll GET /jobs/{job_id} for status; fetch the MP4 from /jobs/{job_id}/result.
+    ?regenerate=true asks GPT and Suno again instead of reusing cached
+    results for the same analysis (the analysis itself is still cached).
+    """
+    job_id = str(uuid.uuid4())
+    video_path = _save_upload(job_id, file)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_path = os.path.join(OUTPUT_DIR, f"{job_id}.mp4")
+    jobs.submit(
+        run_video_to_video,
+        video_path,
+        output_path=output_path,
+        store_dir=os.path.join(ANALYSIS_DIR, job_id),
+        regenerate=regenerate,
+        job_id=job_id,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.post("/jobs/video-to-music/")
+def submit_video_to_music(file: UploadFile = File(...), regenerate: bool = False):
+    job_id = str(uuid.uuid4())
+    video_path = _save_upload(job_id, file)
+    jobs.submit(
+        run_video_to_music,
+        video_path,
+        store_dir=os.path.join(ANALYSIS_DIR, job_id),
+        regenerate=regenerate,
+        job_id=job_id,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, since: int = 0):
+    """
+    Stream the job's partial results and status changes as server-sent
+    events (event: objects | captions | timeline | audio | speech | status).
+    Pass since=<last seq + 1> to resume; the stream ends once the job
+    completes or fails.
+    """
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    async def stream():
+        cursor = since
+        idle = 0.0
+        while True:
+            # Read the status first so no event logged before it is missed
+            job = jobs.get(job_id)
+            done = job is None or job["status"] in FINAL_STATUSES
+            events = jobs.events(job_id, cursor)
+            for event in events:
+                yield (
+                    f"id: {event['seq']}\nevent: {event['type']}\n"
+                    f"data: {json.dumps(event, default=str)}\n\n"
+                )
+            cursor += len(events)
+            if done:
+                break
+            if events:
+                idle = 0.0
+            elif idle >= SSE_KEEPALIVE_SEC:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(SSE_POLL_SEC)
+            idle += SSE_POLL_SEC
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job["status"] != "complete":
+        raise HTTPException(
+            status_code=409, detail=f"Job {job_id} is {job['status']}, not complete"
+        )
+    result = job["result"] or {}
+    if result.get("output_path") and os.path.exists(result["output_path"]):
+        return FileResponse(result["output_path"], media_type="video/mp4")
+    if result.get("audio_path") and os.path.exists(result["audio_path"]):
+        return FileResponse(result["audio_path"], media_type="audio/mpeg")
+    return result
+
+
+@app.get("/jobs/{job_id}/analysis")
+def job_analysis(job_id: str):
+    """
+    The job's analysis timelines, read back from its AnalysisStore.
+    """
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    store_dir = os.path.join(ANALYSIS_DIR, job_id)
+    if not os.path.isdir(store_dir):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has no analysis yet")
+    store = AnalysisStore(store_dir)
+    # tables() only reads part headers, so each table's data is loaded once
+    return {table: store.rows(table) for table in store.tables()}
@@ -0,0 +1,80 @@
+"""
+Process-wide model registry.
+
+Each analysis module registers a loader for the models it needs at import
+time; the model is built once per worker process, on first use or via
+warm_start() (e.g. at FastAPI startup), and then shared across requests,
+segments and DataFromVideo instances.
+
+Usage:
+  register_model("yolo", lambda: torch.hub.load(...))
+  yolo = get_model("yolo")
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_LOADERS: Dict[str, Callable[[], Any]] = {}
+_MODELS: Dict[str, Any] = {}
+_LOCKS: Dict[str, threading.Lock] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register_model(name: str, loader: Callable[[], Any]) -> None:
+    """
+    Register a zero-argument loader for a model. Re-registering a name drops
+    any instance already loaded under it.
+    """
+    with _REGISTRY_LOCK:
+        _LOADERS[name] = loader
+        _LOCKS.setdefault(name, threading.Lock())
+        _MODELS.pop(name, None)
+
+
+def get_model(name: str) -> Any:
+    """
+    Return the shared instance for name, loading it on first use.
+    Concurrent first calls for the same model wait on a single load.
+    """
+    model = _MODELS.get(name)
+    if model is not None:
+        return model
+
+    if name not in _LOADERS:
+        raise KeyError(f"No loader registered for model '{name}'")
+
+    with _LOCKS[name]:
+        model = _MODELS.get(name)
+        if model is None:
+            t0 = time.time()
+            model = _LOADERS[name]()
+            _MODELS[name] = model
+            print(f"[models] Loaded {name} in {time.time() - t0:.1f}s")
+    return model
+
+
+def warm_start(names: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Eagerly load the given models (default: every registered model).
+    Returns the names that were loaded.
+    """
+    names = list(names) if names is not None else list(_LOADERS)
+    for name in names:
+        get_model(name)
+    return names
+
+
+def unload_models(names: Optional[Iterable[str]] = None) -> None:
+    """
+    Drop loaded instances (default: all) so the next get_model() reloads,
+    e.g. after switching INFERENCE_BACKEND.
+    """
+    names = list(names) if names is not None else list(_MODELS)
+    for name in names:
+        with _LOCKS.get(name, _REGISTRY_LOCK):
+            _MODELS.pop(name, None)
+
+
+def loaded_models() -> List[str]:
+    return list(_MODELS)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+'''
+Per-job AnalysisStore: typed round trip of the analyzers' rows, header-only
+row counts and time-ordered timeline reads.
+'''
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from analysisStore import AnalysisStore
+
+
+def _segment(i, **overrides):
+    row = {
+        "segment": i, "start_time": 0.0, "end_time": 3.2, "duration": 3.2,
+        "top_mood": "calm", "confidence": 0.8, "top_2_mood": "sad", "confidence_2": 0.1,
+        "mood_3": "happy", "score_3": 0.05, "timestamp": "2026-10-17T10:00:00",
+        "all_moods": [],  # not a column; extra keys are ignored
+    }
+    row.update(overrides)
+    return row
+
+
+def test_audio_rows_round_trip_exactly(tmp_path):
+    store = AnalysisStore(str(tmp_path))
+    store.append("audio", [_segment(1), _segment(2, start_time=3.2, end_time=6.4)])
+
+    rows = store.rows("audio")
+
+    assert rows[0]["confidence"] == 0.8  # not 0.800000011920929
+    assert rows[1]["start_time"] == 3.2
+    assert (rows[0]["mood_3"], rows[0]["score_3"]) == ("happy", 0.05)
+    assert rows[0]["timestamp"] == "2026-10-17T10:00:00"
+    assert "all_moods" not in rows[0]
+
+
+def test_timeline_reads_back_in_time_order(tmp_path):
+    store = AnalysisStore(str(tmp_path))
+    chunk = lambda t, label: {"start_sec": t, "end_sec": t + 5, "scene_label": label, "confidence": 0.5}
+    store.append("timeline", [chunk(10.0, "c"), chunk(15.0, "d")])
+    store.append("timeline", [chunk(0.0, "a"), chunk(5.0, "b")])
+
+    assert [r["scene_label"] for r in store.rows("timeline")] == ["a", "b", "c", "d"]
+
+
+def test_tables_counts_rows_across_parts(tmp_path):
+    store = AnalysisStore(str(tmp_path))
+    store.append("captions", [{"frame": 0, "timestamp_sec": 0.0, "caption": "x"}] * 3)
+    store.append("captions", [{"frame": 9, "timestamp_sec": 0.4, "caption": "y"}])
+    store.append("objects", [])
+
+    # A reopened store (e.g. the API reading a job's directory) sees the same
+    assert AnalysisStore(str(tmp_path)).tables() == {"captions": 4}
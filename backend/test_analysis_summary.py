@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+'''
+Bounded analysis summary (analysisSummary.py): caption sampling keeps the
+dominant captions, scene segments cover the whole video.
+'''
+
+from analysisSummary import (
+    MAX_SAMPLE_CAPS,
+    MAX_SCENE_SEGMENTS,
+    format_summary,
+    summarize_analysis,
+    summarize_captions,
+    summarize_scenes,
+)
+
+
+def test_dominant_caption_survives_sampling():
+    # Two thirds of the frames show the beach; the rest are one-off captions
+    detail_list = []
+    for i in range(30):
+        caption = "a beach with waves" if i % 3 else f"a one-off shot number {i}"
+        detail_list.append({"frame": i * 120, "timestamp_sec": i * 4.0, "caption": caption})
+
+    caps = summarize_captions(detail_list)
+
+    assert len(caps) == MAX_SAMPLE_CAPS
+    assert {"caption": "a beach with waves", "count": 20} in caps
+    # One-off ties are broken by time and the result stays in time order
+    assert [c["caption"] for c in caps][:2] == ["a one-off shot number 0", "a beach with waves"]
+
+
+def test_captions_are_deduped_case_and_whitespace_insensitively():
+    caps = summarize_captions([
+        {"caption": "A dog  running"},
+        {"caption": "a dog running"},
+        {"caption": ""},
+    ])
+
+    assert caps == [{"caption": "A dog running", "count": 2}]
+
+
+def test_scene_segments_span_the_whole_video():
+    # 80 alternating 5 s chunks: nothing merges, all segments equally long
+    timeline = [
+        {"start_sec": i * 5.0, "end_sec": (i + 1) * 5.0,
+         "scene_label": "surfing" if i % 2 else "walking", "confidence": 0.5}
+        for i in range(80)
+    ]
+
+    segments = summarize_scenes(timeline)["scene_segments"]
+
+    assert len(segments) == MAX_SCENE_SEGMENTS
+    assert segments[0]["start_sec"] < 40.0
+    assert segments[-1]["end_sec"] > 360.0
+    starts = [s["start_sec"] for s in segments]
+    assert starts == sorted(starts)
+
+
+def test_format_summary_shows_caption_counts():
+    summary = summarize_analysis(
+        [], [{"timestamp_sec": 1.0, "caption": "a red car"}] * 3, []
+    )
+
+    assert "a red car (x3)" in format_summary(summary)
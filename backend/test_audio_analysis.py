@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+'''
+Speech timeline (audioAnalysis.py): speech scores come from the mood pass's
+CLAP audio embeddings, so the audio encoder runs once per window.
+A tiny stand-in for the CLAP processor/model is registered under "clap".
+'''
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("librosa")
+
+import numpy as np
+
+import audioAnalysis
+from modelRegistry import register_model, unload_models
+
+
+class _Inputs(dict):
+    def to(self, device):
+        return self
+
+
+class _FeatureExtractor:
+    sampling_rate = audioAnalysis.SAMPLE_RATE
+
+    def __call__(self, batch, sampling_rate, return_tensors):
+        # One feature per window: its mean level, enough to tell windows apart
+        return _Inputs(x=torch.tensor([[float(np.abs(w).mean())] for w in batch]))
+
+
+class _Tokenizer:
+    def __call__(self, texts, padding, return_tensors):
+        return _Inputs(n=torch.arange(len(texts), dtype=torch.float32))
+
+
+class _Processor:
+    feature_extractor = _FeatureExtractor()
+    tokenizer = _Tokenizer()
+
+
+class _Model:
+    device = "cpu"
+    logit_scale_a = torch.tensor(0.0)
+
+    def __init__(self):
+        self.audio_windows = 0
+
+    def get_audio_features(self, x):
+        self.audio_windows += len(x)
+        return torch.cat([x, 1 - x], dim=-1)
+
+    def get_text_features(self, n):
+        return torch.stack([n + 1, torch.ones_like(n)], dim=-1)
+
+
+@pytest.fixture
+def fake_clap():
+    model = _Model()
+    register_model("clap", lambda: (_Processor(), model))
+    audioAnalysis._TEXT_EMBEDDINGS.clear()
+    yield model
+    register_model("clap", audioAnalysis._load_clap)
+    unload_models(["clap"])
+    audioAnalysis._TEXT_EMBEDDINGS.clear()
+
+
+def test_speech_reuses_mood_embeddings(fake_clap):
+    sr = audioAnalysis.SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    audio = (0.05 * rng.standard_normal(40 * sr)).astype(np.float32)
+
+    segments = list(audioAnalysis.iter_audio_segments(audio, num_segments=4, speech=True))
+    windows = [w for seg in segments for w in seg["speech_windows"]]
+
+    # 10 s segments -> 3 windows each at 5 s / 2.5 s hop, each encoded once
+    assert len(windows) == 12
+    assert fake_clap.audio_windows == len(windows)
+    # Times are absolute and stay inside their segment
+    assert windows[3]["t0"] == 10.0 and windows[-1]["t1"] <= 40.0
+    # Loudness is measured before normalization (~ -26 dBFS here)
+    assert all(-27.0 < w["rms_db"] < -25.0 for w in windows)
+    assert all(0.0 <= w["speech"] <= 1.0 for w in windows)
+
+
+def test_mood_results_unchanged_without_speech(fake_clap):
+    sr = audioAnalysis.SAMPLE_RATE
+    audio = np.sin(np.linspace(0, 2000, 20 * sr)).astype(np.float32) * 0.2
+
+    plain = list(audioAnalysis.iter_audio_segments(audio, num_segments=2))
+    with_speech = list(audioAnalysis.iter_audio_segments(audio, num_segments=2, speech=True))
+
+    assert all("speech_windows" not in seg for seg in plain)
+    for a, b in zip(plain, with_speech):
+        assert a["top_mood"] == b["top_mood"] and a["confidence"] == b["confidence"]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+'''
+ClipPollScheduler against a fake fetch_clips: one batched /clips request per
+tick for every waiting clip, shared waiters for the same clip id, and the
+timeout path returning the last clip seen.
+'''
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from SunoMusicGenerator import ClipPollScheduler
+
+
+class FakeClips:
+    # Stand-in for AsyncSunoMusicGenerator._fetch_clips
+    def __init__(self, polls_until_complete):
+        self.polls_until_complete = polls_until_complete  # clip id -> polls, None = never
+        self.requests = []
+        self.polls = {}
+
+    async def __call__(self, clip_ids):
+        self.requests.append(list(clip_ids))
+        clips = []
+        for clip_id in clip_ids:
+            self.polls[clip_id] = self.polls.get(clip_id, 0) + 1
+            needed = self.polls_until_complete[clip_id]
+            done = needed is not None and self.polls[clip_id] >= needed
+            clips.append({"id": clip_id, "status": "complete" if done else "streaming"})
+        return clips
+
+
+def _scheduler(fetch):
+    # No completion estimate and no jitter: poll every min_interval
+    return ClipPollScheduler(
+        fetch, min_interval=0.01, max_interval=0.02, initial_estimate=0.0, jitter=0.0
+    )
+
+
+def test_waiting_clips_share_one_request_per_tick():
+    fetch = FakeClips({"a": 1, "b": 2})
+
+    async def run():
+        scheduler = _scheduler(fetch)
+        return await asyncio.gather(scheduler.wait("a"), scheduler.wait("b"))
+
+    a, b = asyncio.run(run())
+
+    assert (a["status"], b["status"]) == ("complete", "complete")
+    assert fetch.requests == [["a", "b"], ["b"]]
+
+
+def test_same_clip_id_is_polled_once_for_all_waiters():
+    fetch = FakeClips({"a": 2})
+
+    async def run():
+        scheduler = _scheduler(fetch)
+        return await asyncio.gather(scheduler.wait("a"), scheduler.wait("a"))
+
+    first, second = asyncio.run(run())
+
+    assert first == second == {"id": "a", "status": "complete"}
+    assert fetch.requests == [["a"], ["a"]]
+
+
+def test_timeout_returns_last_clip_seen():
+    fetch = FakeClips({"slow": None, "fast": 1})
+
+    async def run():
+        scheduler = _scheduler(fetch)
+        return await asyncio.gather(
+            scheduler.wait("slow", timeout=0.05), scheduler.wait("fast", timeout=5.0)
+        )
+
+    slow, fast = asyncio.run(run())
+
+    assert slow == {"id": "slow", "status": "streaming"}
+    assert fast["status"] == "complete"
+    assert fetch.polls["slow"] >= 2
+    assert fetch.polls["fast"] == 1
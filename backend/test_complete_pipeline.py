@@ -6,8 +6,9 @@ Test file to run both audio analysis and image generation on the same video file
 import os
 import sys
 from DataFromVideo import DataFromVideo
-from audioAnalysis import analyze_audio_segments, save_sentiment_data, extract_audio_16k_mono_to_temp
+from audioAnalysis import analyze_audio_segments, save_sentiment_data, extract_audio_16k_mono
 from VideoToMusic import prompt_gpt
+from analysisSummary import summarize_analysis, format_summary
 from SunoMusicGenerator import SunoMusicGenerator
 from dotenv import load_dotenv
 
@@ -24,16 +25,16 @@ def run_complete_analysis(video_path):
     # 1. Video Analysis (3 CSV files)
     print('\n1. Running Video Analysis...')
     meta_data = DataFromVideo()
-    result_list = meta_data.analyze_video(video_path, step=120)
-    detail_list = meta_data.detail_analyze_video(video_path, step=120)
-    timeline = meta_data.scene_understanding_timeline(video_path, chunk_seconds=5)
+    result_list, detail_list, timeline = meta_data.analyze_all(
+        video_path, step=120, chunk_seconds=5
+    )
     print('✓ Video analysis complete')
     
     # 2. Audio Analysis
     print('\n2. Running Audio Analysis...')
-    tmp_audio = extract_audio_16k_mono_to_temp(video_path)
-    if tmp_audio:
-        audio_results = analyze_audio_segments(tmp_audio, num_segments=4)
+    audio = extract_audio_16k_mono(video_path)
+    if audio is not None:
+        audio_results = analyze_audio_segments(audio, num_segments=4)
         audio_csv_path = save_sentiment_data(audio_results, video_path)
         print('Audio analysis complete')
     else:
@@ -56,13 +57,9 @@ Keep responses concise (1 sentences per scene, under 50 characters).
 Focus only on mood, genre, and instrumentation. Avoid long explanations.
 Output only the music prompt text, nothing else.'''
     
-    user_input = f'''VIDEO ANALYSIS DATA:
-- Objects detected: {result_list}
-- Scene descriptions: {detail_list}  
-- Action/scene timeline with confidence: {timeline}
-
-AUDIO ANALYSIS DATA:
-- Audio mood analysis: {audio_results}
+    summary = summarize_analysis(result_list, detail_list, timeline, audio_results)
+    user_input = f'''ANALYSIS SUMMARY:
+{format_summary(summary)}
 
 CONFIDENCE WEIGHTING INSTRUCTIONS:
 - Prioritize scene labels with confidence > 0.6
@@ -81,23 +78,15 @@ CONFIDENCE WEIGHTING INSTRUCTIONS:
         # 4. Generate Music with Suno
         print('\n4. Generating Music with Suno...')
         suno = SunoMusicGenerator()
-        clip_id = suno.prompt_suno(gpt_response, 'background')
-        print(f'Music generated! Clip ID: {clip_id}')
+        track = suno.generate_track(gpt_response, 'background')
+        print(f'Music generated! Clip ID: {track["id"]}')
         
-        # Check if audio file was created
-        audio_path = f'test/downloads/{clip_id}.mp3'
-        if os.path.exists(audio_path):
-            print(f'Audio file created: {audio_path}')
-            print(f'File size: {os.path.getsize(audio_path) / (1024*1024):.1f} MB')
-        else:
-            print('Audio file not found yet, may still be processing...')
+        audio_path = track['local_path']
+        print(f'Audio file created: {audio_path}')
+        print(f'File size: {os.path.getsize(audio_path) / (1024*1024):.1f} MB')
     else:
         print('No GPT key found, skipping GPT and Suno generation')
     
-    # Cleanup
-    if tmp_audio and os.path.exists(tmp_audio):
-        os.remove(tmp_audio)
-    
     print('\nComplete pipeline finished!')
     return {
         'video_analysis': {
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''
+Thread budget planning, cgroup CPU quota detection and per-thread torch
+intra-op budgets (computeBudget.py).
+'''
+
+import os
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+import computeBudget
+from computeBudget import apply_thread_budget, cgroup_cpu_limit, plan_thread_budget
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for var in ("COMPUTE_CPUS", "JOB_WORKERS", "AUDIO_STAGE_SHARE",
+                "OPENCV_THREADS", "TORCH_INTEROP_THREADS"):
+        monkeypatch.delenv(var, raising=False)
+
+
+def test_plan_splits_cpus_between_jobs_and_stages():
+    budget = plan_thread_budget(cpus=32)
+
+    assert budget["job_workers"] == 4
+    assert budget["per_job"] == 8
+    assert (budget["video"], budget["audio"]) == (6, 2)
+    assert budget["opencv"] == 6
+    assert budget["interop"] == 1
+
+
+def test_plan_never_goes_below_one_thread():
+    budget = plan_thread_budget(cpus=1, job_workers=3)
+
+    assert budget["job_workers"] == 3
+    assert budget["per_job"] == budget["video"] == budget["audio"] == 1
+
+
+def test_plan_reads_env_overrides(monkeypatch):
+    monkeypatch.setenv("COMPUTE_CPUS", "12")
+    monkeypatch.setenv("JOB_WORKERS", "2")
+    monkeypatch.setenv("AUDIO_STAGE_SHARE", "0.5")
+
+    budget = plan_thread_budget()
+
+    assert (budget["cpus"], budget["job_workers"], budget["per_job"]) == (12, 2, 6)
+    assert (budget["video"], budget["audio"]) == (3, 3)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_cgroup_v2_uses_tightest_quota_on_own_path(tmp_path, monkeypatch):
+    root = tmp_path / "cgroup"
+    _write(str(root / "cgroup.controllers"), "cpu memory")
+    _write(str(root / "cpu.max"), "max 100000")
+    _write(str(root / "app.slice" / "cpu.max"), "400000 100000")
+    _write(str(root / "app.slice" / "api.service" / "cpu.max"), "250000 100000")
+    _write(str(root / "other.slice" / "cpu.max"), "50000 100000")
+    _write(str(tmp_path / "proc_cgroup"), "0::/app.slice/api.service\n")
+    monkeypatch.setattr(computeBudget, "_CGROUP_ROOT", str(root))
+    monkeypatch.setattr(computeBudget, "_PROC_CGROUP", str(tmp_path / "proc_cgroup"))
+
+    assert cgroup_cpu_limit() == 2.5
+
+
+def test_cgroup_v2_unlimited(tmp_path, monkeypatch):
+    root = tmp_path / "cgroup"
+    _write(str(root / "cgroup.controllers"), "cpu")
+    _write(str(root / "cpu.max"), "max 100000")
+    _write(str(tmp_path / "proc_cgroup"), "0::/\n")
+    monkeypatch.setattr(computeBudget, "_CGROUP_ROOT", str(root))
+    monkeypatch.setattr(computeBudget, "_PROC_CGROUP", str(tmp_path / "proc_cgroup"))
+
+    assert cgroup_cpu_limit() is None
+
+
+def test_cgroup_v1_cfs_quota(tmp_path, monkeypatch):
+    cpu_dir = tmp_path / "cpu,cpuacct"
+    _write(str(cpu_dir / "docker" / "abc" / "cpu.cfs_quota_us"), "150000")
+    _write(str(cpu_dir / "docker" / "abc" / "cpu.cfs_period_us"), "100000")
+    _write(str(cpu_dir / "cpu.cfs_quota_us"), "-1")
+    _write(str(cpu_dir / "cpu.cfs_period_us"), "100000")
+    _write(str(tmp_path / "proc_cgroup"), "4:cpu,cpuacct:/docker/abc\n1:name=systemd:/\n")
+    monkeypatch.setattr(computeBudget, "_CGROUP_ROOT", str(tmp_path / "no-unified"))
+    monkeypatch.setattr(computeBudget, "_CGROUP_V1_DIRS", (str(cpu_dir),))
+    monkeypatch.setattr(computeBudget, "_PROC_CGROUP", str(tmp_path / "proc_cgroup"))
+
+    assert cgroup_cpu_limit() == 1.5
+
+
+def test_thread_budgets_stay_per_thread():
+    # The thread that sets its budget last must not resize the other's team
+    barrier = threading.Barrier(2)
+    seen = {}
+
+    def stage(threads):
+        apply_thread_budget(threads)
+        barrier.wait()
+        torch.ones(64, 64) @ torch.ones(64, 64)
+        seen[threads] = torch.get_num_threads()
+
+    workers = [threading.Thread(target=stage, args=(n,)) for n in (1, 2)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    assert seen == {1: 1, 2: 2}
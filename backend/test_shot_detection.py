@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+'''
+Keyframe-only shot detection and shot-aligned sampling (DataFromVideo):
+a synthetic clip with hard cuts is split at the cuts, long shots get
+sparse VideoMAE clips instead of one every chunk_seconds, and keyframe
+seeks return the same frames as decoding straight through.
+'''
+
+import subprocess
+
+import numpy as np
+
+import pytest
+
+pytest.importorskip("torch")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("transformers")
+pytest.importorskip("pandas")
+pytest.importorskip("moviepy")
+
+from moviepy.config import FFMPEG_BINARY
+from DataFromVideo import DataFromVideo, SHOT_SAMPLE_GAP_SEC
+
+FPS = 25
+
+
+@pytest.fixture(scope="module")
+def cuts_video(tmp_path_factory):
+    # red 3 s | blue 4 s | test pattern 30 s | green 3 s
+    path = str(tmp_path_factory.mktemp("video") / "cuts.mp4")
+    graph = (
+        f"color=c=red:s=320x180:d=3:r={FPS}[a];"
+        f"color=c=blue:s=320x180:d=4:r={FPS}[b];"
+        f"testsrc=s=320x180:d=30:r={FPS}[c];"
+        f"color=c=green:s=320x180:d=3:r={FPS}[d];"
+        "[a][b][c][d]concat=n=4"
+    )
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-y", "-loglevel", "error", "-filter_complex", graph,
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", path],
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        pytest.skip(f"ffmpeg can't encode the test clip: {proc.stderr[-200:]!r}")
+    return path
+
+
+def test_shots_split_at_the_cuts(cuts_video):
+    shots = DataFromVideo().detect_shots(cuts_video)
+
+    assert shots == [(0, 3 * FPS), (3 * FPS, 7 * FPS), (7 * FPS, 37 * FPS), (37 * FPS, 40 * FPS)]
+
+
+def test_long_shot_gets_sparse_clips(cuts_video):
+    analyzer = DataFromVideo()
+    shots = analyzer.detect_shots(cuts_video)
+
+    chunks = analyzer._shot_chunks(shots, FPS, chunk_seconds=5, num_frames=16)
+
+    # 30 s shot -> ceil(30 / SHOT_SAMPLE_GAP_SEC) clips, not 6 fixed chunks
+    long_shot = [c for c in chunks if 7.0 <= c[0] < 37.0]
+    assert len(long_shot) == int(-(-30 // SHOT_SAMPLE_GAP_SEC))
+    # Clips cover the whole timeline but sample only a 5 s window each
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 40.0
+    for _, _, frame_indices in chunks:
+        assert frame_indices[-1] - frame_indices[0] < 5 * FPS
+
+
+def test_unreadable_video_falls_back_to_fixed_grid(tmp_path):
+    bogus = tmp_path / "not_a_video.mp4"
+    bogus.write_bytes(b"nope")
+
+    assert DataFromVideo().detect_shots(str(bogus)) is None
+
+
+def test_seek_sampling_matches_grab(cuts_video):
+    analyzer = DataFromVideo()
+    keyframes, _ = analyzer._keyframe_scan(cuts_video, FPS)
+    indices = list(range(0, 40 * FPS, 4 * FPS)) + [40 * FPS - 2]
+
+    frames = {}
+    for mode in ("grab", "seek"):
+        cap = cv2.VideoCapture(cuts_video)
+        frames[mode] = [
+            (idx, frame.copy())
+            for idx, frame in analyzer._sample_frames(cap, indices, FPS, mode, keyframes)
+        ]
+        cap.release()
+
+    assert [idx for idx, _ in frames["seek"]] == indices
+    for (_, grabbed), (_, sought) in zip(frames["grab"], frames["seek"]):
+        assert np.array_equal(grabbed, sought)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+'''
+Runs AsyncSunoMusicGenerator end to end against an in-process fake Suno API
+(httpx.MockTransport): /generate, /clips?ids= polling and the audio download.
+'''
+
+import asyncio
+import os
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from SunoMusicGenerator import AsyncSunoMusicGenerator
+
+BASE_URL = "http://suno.test/api"
+AUDIO = b"ID3" + b"\x00" * 1024
+
+
+def fake_suno(polls_until_complete=2):
+    calls = {"generate": 0, "clips": 0, "audio": 0}
+
+    def handler(request):
+        path = request.url.path
+        if path == "/api/generate":
+            calls["generate"] += 1
+            assert request.headers["Authorization"] == "Bearer test-key"
+            return httpx.Response(200, json={"id": "clip-1", "status": "submitted"})
+        if path == "/api/clips":
+            calls["clips"] += 1
+            assert request.url.params["ids"] == "clip-1"
+            done = calls["clips"] >= polls_until_complete
+            clip = {"id": "clip-1", "status": "complete" if done else "streaming"}
+            if done:
+                clip["audio_url"] = "http://cdn.suno.test/clip-1.mp3"
+            return httpx.Response(200, json=[clip])
+        if request.url.host == "cdn.suno.test":
+            calls["audio"] += 1
+            # API credentials must not be sent to the CDN
+            assert "Authorization" not in request.headers
+            return httpx.Response(200, content=AUDIO, headers={"content-type": "audio/mpeg"})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler), calls
+
+
+async def _generate(transport):
+    async with AsyncSunoMusicGenerator(
+        api_key="test-key",
+        base_url=BASE_URL,
+        transport=transport,
+        poll_min_interval=0.01,
+        poll_max_interval=0.05,
+    ) as suno:
+        suno.scheduler.estimate = 0.0  # poll right away instead of after ~16s
+        return await suno.generate_track("lofi beach", "chill")
+
+
+def test_generate_track_downloads_http_audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    transport, calls = fake_suno()
+
+    clip = asyncio.run(_generate(transport))
+
+    assert clip["id"] == "clip-1"
+    assert clip["status"] == "complete"
+    assert clip["local_path"] == os.path.join("test", "downloads", "clip-1.mp3")
+    with open(clip["local_path"], "rb") as f:
+        assert f.read() == AUDIO
+    assert calls == {"generate": 1, "clips": 2, "audio": 1}